@@ -0,0 +1,86 @@
+import random
+import time
+import numpy as np
+from lgp.program import Program
+from lgp.trainer import Trainer
+from lgp.kernels import markEffective
+
+"""
+Compares the time of Trainer.generate with bitwise instruction decoding against
+the old string based decoding. Run with: python benchmarks/bench_decode.py
+"""
+
+"""
+The old decoder, formatting each instruction into a binary string and slicing.
+"""
+def stringIntSegment(num, bitStart, bitLen):
+    binStr = format(num, 'b').zfill(sum(Program.instLengths))
+    return int(binStr[bitStart:bitStart+bitLen], 2)
+
+def stringExtractInstructionsData(self):
+    instsData = np.array([
+        [
+            stringIntSegment(inst, 0, Program.instLengths[0]),
+            stringIntSegment(inst, Program.instLengths[0],
+                    Program.instLengths[1]),
+            stringIntSegment(inst, sum(Program.instLengths[:2]),
+                    Program.instLengths[2]),
+            stringIntSegment(inst, sum(Program.instLengths[:3]),
+                    Program.instLengths[3])
+        ]
+        for inst in self.instructions])
+
+    modes = np.array(instsData[:,0], dtype = bool)
+    ops = np.array(instsData[:,1], dtype = np.int8)
+    dests = np.array(instsData[:,2], dtype = np.int8)
+    srcs = np.array(instsData[:,3], dtype = np.int32)
+
+    effective = markEffective(modes, ops, dests, srcs,
+            Program.numOutRegs+Program.numMemRegs+Program.numFgtRegs,
+            Program.numOutRegs+Program.numMemRegs)
+
+    self.code = Program.packCode(modes[effective], ops[effective],
+            dests[effective], srcs[effective])
+
+"""
+decodePrograms with the old decoder, which Trainer.generate decodes children
+with.
+"""
+def stringDecodePrograms(programs):
+    for prog in programs:
+        stringExtractInstructionsData(prog)
+
+"""
+Average seconds per Trainer.generate call over some generations.
+"""
+def timeGenerate(popSize, gens, seed=0):
+    random.seed(seed)
+    trainer = Trainer(numActions=8, popSize=popSize, seed=seed)
+    total = 0
+    for _ in range(gens):
+        for prog in trainer.programs:
+            prog.reward('task', random.random())
+        trainer.select(['task'], 'min')
+        start = time.perf_counter()
+        trainer.generate()
+        total += time.perf_counter() - start
+        trainer.curGen += 1
+
+    return total/gens
+
+if __name__ == '__main__':
+    timeGenerate(10, 1) # compile kernels first
+
+    bitwiseExtract = Program.extractInstructionsData
+    bitwiseDecode = Program.decodePrograms
+    print('{:>8} {:>12} {:>12} {:>8}'.format(
+            'popSize', 'string (s)', 'bitwise (s)', 'speedup'))
+    for popSize in [200, 1000, 5000]:
+        Program.extractInstructionsData = stringExtractInstructionsData
+        Program.decodePrograms = stringDecodePrograms
+        strTime = timeGenerate(popSize, 5)
+        Program.extractInstructionsData = bitwiseExtract
+        Program.decodePrograms = bitwiseDecode
+        bitTime = timeGenerate(popSize, 5)
+        print('{:>8} {:>12.4f} {:>12.4f} {:>7.2f}x'.format(
+                popSize, strTime, bitTime, strTime/bitTime))
@@ -0,0 +1,94 @@
+import time
+import numpy as np
+from lgp.program import Program
+from lgp.trainer import Trainer
+from lgp.team_trainer import TeamTrainer
+from lgp.executor import PopulationExecutor
+
+"""
+Compares the time of generate with bulk breeding against breeding one child at
+a time, for Trainer (also against the old breed, which created a random genome
+for each child before copying the parent's over it) and TeamTrainer, with list
+and array genomes. Evaluating the population once on a 1000 row dataset is
+timed for scale. Run with: python benchmarks/bench_generate.py
+"""
+
+"""
+Trainer with the old breed, creating each child as a new random program.
+"""
+class OldTrainer(Trainer):
+
+    def breed(self, parent, rng=None):
+        newProg = Program(genCreate=self.curGen, rng=rng)
+        newProg.instructions = Program.copyInstructions(parent.instructions)
+        newProg.mutate(rng=rng)
+        return self.addChild(newProg)
+
+"""
+generate breeding one child at a time with breed.
+"""
+def serialGenerate(trainer):
+    if isinstance(trainer, TeamTrainer):
+        parents = list(trainer.teams)
+    else:
+        parents = list(trainer.programs)
+    allPrograms = list(trainer.programs)
+    numNew = trainer.popSize - len(parents)
+    parentIdxs = trainer.rng.integers(len(parents), size=numNew)
+    for idx, rng in zip(parentIdxs, trainer.spawnRngs(numNew)):
+        if isinstance(trainer, TeamTrainer):
+            trainer.breed(parents[idx], rng, allPrograms)
+        else:
+            trainer.breed(parents[idx], rng)
+
+"""
+Average seconds per generate call over some generations.
+"""
+def timeGenerate(trainer, generateFn, gens=3):
+    total = 0
+    for _ in range(gens):
+        for agent in trainer.getAgents():
+            agent.reward('task', float(trainer.rng.random()))
+        trainer.select(['task'], 'min')
+        start = time.perf_counter()
+        generateFn(trainer)
+        total += time.perf_counter() - start
+        trainer.curGen += 1
+
+    return total/gens
+
+def timeEvaluate(trainer, obs):
+    executor = PopulationExecutor(trainer.programs, trainer.registerBank)
+    start = time.perf_counter()
+    executor.getBatchActions(obs)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    obs = np.random.default_rng(0).standard_normal((1000, 16))
+    popSize = 2000
+    for arrayGenome in [False, True]:
+        # compile kernels first
+        timeEvaluate(Trainer(numActions=4, popSize=10, arrayGenome=arrayGenome,
+                seed=0), obs)
+        timeGenerate(Trainer(numActions=4, popSize=10, arrayGenome=arrayGenome,
+                seed=0), lambda trainer: trainer.generate(), 1)
+
+        genome = 'array' if arrayGenome else 'list'
+        print('{} genomes, popSize {}'.format(genome, popSize))
+        print('{:>12} {:>10} {:>10} {:>10} {:>8} {:>13}'.format('trainer',
+                'old (s)', 'serial (s)', 'bulk (s)', 'speedup', 'evaluate (s)'))
+        for trainerClass in [Trainer, TeamTrainer]:
+            def makeTrainer(cls=trainerClass):
+                return cls(numActions=4, popSize=popSize, maxProgSize=128,
+                        arrayGenome=arrayGenome, seed=1)
+
+            oldTime = ''
+            if trainerClass is Trainer:
+                oldTime = '{:.3f}'.format(timeGenerate(
+                        makeTrainer(OldTrainer), serialGenerate))
+            serialTime = timeGenerate(makeTrainer(), serialGenerate)
+            trainer = makeTrainer()
+            bulkTime = timeGenerate(trainer, lambda trainer: trainer.generate())
+            print('{:>12} {:>10} {:>10.3f} {:>10.3f} {:>7.2f}x {:>13.3f}'.format(
+                    trainerClass.__name__, oldTime, serialTime, bulkTime,
+                    serialTime/bulkTime, timeEvaluate(trainer, obs)))
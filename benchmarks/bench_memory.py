@@ -0,0 +1,73 @@
+import gc
+import random
+import tracemalloc
+import numpy as np
+from lgp.program import Program
+
+"""
+Measures the memory used per program, for populations of 10k and 100k programs,
+with list and array genomes, before and after the programs have run (which
+allocates their registers). The old unslotted layout, with four decoded arrays
+and eagerly allocated registers, is measured too for comparison. Run with:
+python benchmarks/bench_memory.py
+"""
+
+"""
+Stand in for the old Program layout, built from a program's instructions (the
+program itself is dropped after).
+"""
+class OldLayout:
+
+    def __init__(self, prog):
+        self.instructions = prog.instructions
+        self.id = prog.id
+        self.genCreate = prog.genCreate
+        self.registers = np.zeros(Program.numOutRegs+Program.numMemRegs+
+                Program.numFgtRegs)
+        self.modes = np.array(prog.modes)
+        self.ops = np.array(prog.ops)
+        self.dests = np.array(prog.dests)
+        self.srcs = np.array(prog.srcs)
+        self.outcomes = {}
+        self.fitness = None
+
+"""
+Bytes per program for making popSize programs with makeFn, and after running
+them once if run.
+"""
+def bytesPerProgram(makeFn, popSize, run=False, seed=0):
+    random.seed(seed)
+    Program.rng = np.random.default_rng(seed)
+    gc.collect()
+    tracemalloc.start()
+    programs = [makeFn() for _ in range(popSize)]
+    if run:
+        obs = np.zeros(8)
+        for prog in programs:
+            prog.getAction(obs)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del programs
+
+    return size/popSize
+
+def newProgram():
+    return Program(progSize=random.randint(1, Program.maxProgSize))
+
+def oldProgram():
+    return OldLayout(newProgram())
+
+if __name__ == '__main__':
+    Program.numOutRegs = 8
+    newProgram().getAction(np.zeros(8)) # compile kernels first
+
+    print('{:>8} {:>7} {:>14} {:>14} {:>14}'.format(
+            'popSize', 'genome', 'old (B/prog)', 'new (B/prog)', 'new run'))
+    for popSize in [10000, 100000]:
+        for arrayGenome in [False, True]:
+            Program.arrayGenome = arrayGenome
+            print('{:>8} {:>7} {:>14.0f} {:>14.0f} {:>14.0f}'.format(
+                    popSize, 'array' if arrayGenome else 'list',
+                    bytesPerProgram(oldProgram, popSize),
+                    bytesPerProgram(newProgram, popSize),
+                    bytesPerProgram(newProgram, popSize, run=True)))
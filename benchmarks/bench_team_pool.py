@@ -0,0 +1,91 @@
+import random
+import time
+from lgp.program import Program
+from lgp.team import Team
+from lgp.team_trainer import TeamTrainer
+
+"""
+Compares the time of TeamTrainer.evolve with the program pool against the old
+list bookkeeping (linear membership checks and removal, and a copy of the list
+per new team), for large populations of large teams. Run with:
+python benchmarks/bench_team_pool.py
+"""
+
+"""
+TeamTrainer with the old list based select and generate.
+"""
+class ListTeamTrainer(TeamTrainer):
+
+    def initPop(self):
+        super().initPop()
+        self.programs = list(self.programs)
+
+    def evolve(self, tasks, fitType='min'):
+        self.select(tasks, fitType)
+        self.generate()
+        self.curGen += 1
+
+        # track new programs
+        for team in self.teams:
+            for prog in team.programs:
+                if prog not in self.programs:
+                    self.programs.append(prog)
+                    self.registerBank.acquire(prog)
+
+        self.registerBank.clear()
+
+    def select(self, tasks, fitType, norm=True):
+        numKeep = self.popSize - int(self.popSize * self.gap)
+        order = self.scoreTable.rank([team.id for team in self.teams], tasks)
+        rankedTeams = [self.teams[i] for i in order]
+        self.teams = rankedTeams[:numKeep]
+
+        for team in rankedTeams[numKeep:]:
+            self.untrackTeam(team)
+            for prog in team.programs:
+                prog.refs -= 1
+                if prog.refs == 0:
+                    self.programs.remove(prog)
+                    self.registerBank.release(prog)
+
+    def generate(self):
+        parents = list(self.teams)
+        for i in range((self.popSize - len(self.teams))):
+            p = parents[self.rng.integers(len(parents))]
+            newTeam = Team(team=p, genCreate=self.curGen)
+            newTeam.mutate(pDel=self.pProgDel, pSwp=self.pProgSwp,
+                    pMut=self.pProgMut, allPrograms=list(self.programs),
+                    gen=self.curGen, pAddInst=Program.pInstAdd,
+                    pDelInst=Program.pInstDel, pSwpInst=Program.pInstSwp,
+                    pMutInst=Program.pInstMut, rng=self.rng)
+            self.teams.append(newTeam)
+            self.trackTeam(newTeam)
+
+"""
+Average seconds per evolve call over some generations.
+"""
+def timeEvolve(trainerClass, popSize, numActions, gens, seed=0):
+    random.seed(seed)
+    trainer = trainerClass(numActions=numActions, popSize=popSize,
+            maxProgSize=32, seed=seed)
+    total = 0
+    for _ in range(gens):
+        for team in trainer.teams:
+            team.reward('task', random.random())
+        start = time.perf_counter()
+        trainer.evolve('task')
+        total += time.perf_counter() - start
+
+    return total/gens
+
+if __name__ == '__main__':
+    timeEvolve(TeamTrainer, 10, 2, 1) # compile kernels first
+
+    numActions = 32
+    print('{:>8} {:>10} {:>10} {:>10} {:>8}'.format(
+            'popSize', 'numActions', 'list (s)', 'pool (s)', 'speedup'))
+    for popSize in [1000, 2000, 4000]:
+        listTime = timeEvolve(ListTeamTrainer, popSize, numActions, 3)
+        poolTime = timeEvolve(TeamTrainer, popSize, numActions, 3)
+        print('{:>8} {:>10} {:>10.3f} {:>10.3f} {:>7.2f}x'.format(
+                popSize, numActions, listTime, poolTime, listTime/poolTime))
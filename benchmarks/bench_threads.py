@@ -0,0 +1,63 @@
+import argparse
+import time
+import numpy as np
+from lgp.trainer import Trainer
+from lgp.executor import PopulationExecutor
+from lgp import kernels
+
+"""
+Scaling of the parallel population x observation kernel from 1 thread up to
+Numba's thread pool size (NUMBA_NUM_THREADS, by default the number of cores),
+against the single threaded Program.getActions loop over the population. Run
+with: python benchmarks/bench_threads.py [--pop 1000] [--rows 1000]
+"""
+
+"""
+Median seconds of fn over repeats, after a warm up call.
+"""
+def timeIt(fn, repeats=3):
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def threadCounts(maxThreads):
+    counts = [1]
+    while counts[-1]*2 < maxThreads:
+        counts.append(counts[-1]*2)
+    if maxThreads > 1:
+        counts.append(maxThreads)
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pop', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--maxProgSize', type=int, default=128)
+    args = parser.parse_args()
+
+    trainer = Trainer(numActions=4, popSize=args.pop,
+            maxProgSize=args.maxProgSize, seed=0)
+    obs = np.random.default_rng(0).standard_normal((args.rows, 16))
+    executor = PopulationExecutor(trainer.programs, trainer.registerBank)
+    numInsts = len(executor.modes)*args.rows
+
+    loopTime = timeIt(lambda: [prog.getActions(obs) for prog in trainer.programs])
+    print('pop {} rows {} mean effective length {:.1f}'.format(
+            args.pop, args.rows, len(executor.modes)/args.pop))
+    print('{:>8} {:>10} {:>12} {:>8} {:>10}'.format(
+            'threads', 'time (s)', 'Minst/s', 'speedup', 'vs loop'))
+    print('{:>8} {:>10.3f} {:>12.1f} {:>8} {:>10}'.format(
+            'loop', loopTime, numInsts/loopTime/1e6, '', '1.00x'))
+
+    baseTime = None
+    for numThreads in threadCounts(kernels.setNumThreads()):
+        secs = timeIt(lambda: executor.getBatchActions(obs,
+                numThreads=numThreads))
+        baseTime = baseTime or secs
+        print('{:>8} {:>10.3f} {:>12.1f} {:>7.2f}x {:>9.2f}x'.format(
+                numThreads, secs, numInsts/secs/1e6, baseTime/secs,
+                loopTime/secs))
@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import numpy as np
+from lgp.program import Program
+from lgp.trainer import Trainer
+from lgp.team_trainer import TeamTrainer
+from lgp.executor import TeamExecutor
+from lgp.kernels import runInstructions
+from lgp.pareto import paretoRank
+from lgp.util import paretoDominate
+from lgp.checkpoint import saveCheckpoint, loadCheckpoint
+
+"""
+Benchmark suite of the engine: kernel speed by program length and op mix,
+decode and mutate cost, Trainer and TeamTrainer generation time, pareto ranking
+and checkpoints. Every benchmark is seeded and uses synthetic offline tasks, so
+runs are comparable between commits:
+
+    python benchmarks/run_benchmarks.py --json before.json
+    (change things)
+    python benchmarks/run_benchmarks.py --compare before.json
+
+Times are the median over repeats. --quick runs smaller sizes, and --only runs
+the benchmarks whose name contains the given text.
+"""
+
+OP_MIXES = {
+    'arith': [0, 1, 2, 3], # add, sub, mult, div
+    'transc': [4, 5, 6], # cos, log, exp
+    'all': list(range(8))
+}
+
+def seedAll(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    Program.rng = np.random.default_rng(seed)
+
+def setProgramDefaults():
+    Program.numOutRegs = 8
+    Program.numMemRegs = 8
+    Program.numFgtRegs = 8
+    Program.maxProgSize = 128
+    Program.arrayGenome = False
+    Program.profiler = None
+
+"""
+Median seconds of fn over repeats, after a warm up call.
+"""
+def timeIt(fn, repeats=5):
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+"""
+Random genomes of length instructions, with ops drawn from the mix.
+"""
+def makeGenomes(num, length, ops, seed):
+    rng = np.random.default_rng(seed)
+    numBits = sum(Program.instLengths)
+    genomes = rng.integers(0, 2**numBits, size=(num, length), dtype=np.int64)
+    opShift = numBits - Program.instLengths[0] - Program.instLengths[1]
+    genomes &= ~(((1 << Program.instLengths[1]) - 1) << opShift)
+    genomes |= rng.choice(ops, size=(num, length)).astype(np.int64) << opShift
+    return genomes
+
+"""
+Synthetic regression task: score of each agent's outputs against a fixed
+function of the inputs.
+"""
+def makeDataset(seed, rows=64, cols=8):
+    rng = np.random.default_rng(seed)
+    obs = rng.standard_normal((rows, cols))
+    target = np.sin(obs[:, 0]) + obs[:, 1]*obs[:, 2]
+    return obs, target
+
+def clippedSquareError(out, target):
+    return np.minimum(np.abs(out - target), 1e3)**2
+
+def scorePrograms(trainer, obs, target):
+    for prog in trainer.programs:
+        out = prog.getActions(obs)[:, 0]
+        prog.reward('regression', -float(np.mean(clippedSquareError(out, target))))
+
+def scoreTeams(trainer, obs, target):
+    executor = TeamExecutor(trainer.teams, trainer.registerBank)
+    errors = np.zeros(len(trainer.teams))
+    for row, y in zip(obs, target):
+        actions = executor.getActions(row)
+        errors += clippedSquareError(actions[:, 0], y)
+    for team, error in zip(trainer.teams, errors):
+        team.reward('regression', -float(error/len(obs)))
+
+def benchKernel(quick):
+    results = []
+    obs = np.random.default_rng(0).standard_normal(16)
+    regs = np.zeros(24)
+    for length in ([32, 128] if quick else [16, 64, 256, 1024]):
+        for mix, ops in OP_MIXES.items():
+            modes, opArr, dests, srcs = Program.decodeInstructions(
+                    makeGenomes(1, length, ops, seed=length)[0])
+            reps = max(1, 200000//length)
+            def run():
+                for _ in range(reps):
+                    runInstructions(obs, regs, modes, opArr, dests, srcs, 0,
+                            length)
+            secs = timeIt(run, 3)
+            results.append(('kernel', 'len={} ops={}'.format(length, mix),
+                    reps*length/secs, 'inst/s'))
+    return results
+
+def benchDecodeMutate(quick):
+    results = []
+    num = 200 if quick else 1000
+    for arrayGenome in [False, True]:
+        Program.arrayGenome = arrayGenome
+        seedAll(1)
+        programs = [Program(progSize=random.randint(1, Program.maxProgSize))
+                    for _ in range(num)]
+        genome = 'array' if arrayGenome else 'list'
+
+        def decode():
+            for prog in programs:
+                prog.extractInstructionsData()
+        results.append(('decode', 'genome={}'.format(genome),
+                timeIt(decode)/num*1e6, 'us/prog'))
+
+        def mutate():
+            seedAll(2)
+            for prog in programs:
+                prog.mutate(0.08, 0.06, 0.05, 0.05)
+        results.append(('mutate', 'genome={}'.format(genome),
+                timeIt(mutate)/num*1e6, 'us/prog'))
+    setProgramDefaults()
+    return results
+
+def benchEvolve(quick):
+    results = []
+    obs, target = makeDataset(3)
+    for popSize in ([100] if quick else [100, 500]):
+        for maxProgSize in ([32, 128] if quick else [32, 128, 512]):
+            seedAll(4)
+            trainer = Trainer(numActions=1, popSize=popSize,
+                    maxProgSize=maxProgSize, seed=4)
+            scorePrograms(trainer, obs, target)
+            def evolve():
+                trainer.evolve('regression')
+                scorePrograms(trainer, obs, target)
+            results.append(('Trainer.evolve',
+                    'pop={} maxProg={}'.format(popSize, maxProgSize),
+                    timeIt(evolve)*1e3, 'ms/gen'))
+
+            seedAll(5)
+            trainer = TeamTrainer(numActions=4, popSize=popSize,
+                    maxProgSize=maxProgSize, seed=5)
+            scoreTeams(trainer, obs, target)
+            def evolveTeams():
+                trainer.evolve('regression')
+                scoreTeams(trainer, obs, target)
+            results.append(('TeamTrainer.evolve',
+                    'pop={} maxProg={}'.format(popSize, maxProgSize),
+                    timeIt(evolveTeams)*1e3, 'ms/gen'))
+    setProgramDefaults()
+    return results
+
+def benchPareto(quick):
+    results = []
+    for num in ([500] if quick else [500, 2000, 8000]):
+        for numObjs in [2, 3]:
+            scores = np.random.default_rng(num).random((num, numObjs))
+            agents = list(range(num))
+            results.append(('paretoRank', 'n={} k={}'.format(num, numObjs),
+                    timeIt(lambda: paretoRank(agents, scores))*1e3, 'ms'))
+            results.append(('paretoDominate', 'n={} k={}'.format(num, numObjs),
+                    timeIt(lambda: paretoDominate(agents, scores))*1e3, 'ms'))
+    return results
+
+def benchCheckpoint(quick):
+    results = []
+    popSize = 500 if quick else 5000
+    seedAll(6)
+    trainer = Trainer(numActions=4, popSize=popSize, seed=6)
+    for prog in trainer.programs:
+        prog.reward('regression', random.random())
+    fileName = os.path.join(tempfile.mkdtemp(), 'bench.lgp')
+    results.append(('checkpoint.save', 'pop={}'.format(popSize),
+            timeIt(lambda: saveCheckpoint(fileName, trainer))*1e3, 'ms'))
+    results.append(('checkpoint.load', 'pop={}'.format(popSize),
+            timeIt(lambda: loadCheckpoint(fileName))*1e3, 'ms'))
+    os.remove(fileName)
+    setProgramDefaults()
+    return results
+
+BENCHMARKS = [
+    ('kernel', benchKernel),
+    ('decodeMutate', benchDecodeMutate),
+    ('evolve', benchEvolve),
+    ('pareto', benchPareto),
+    ('checkpoint', benchCheckpoint)
+]
+
+def printTable(results, baseline):
+    print('{:<20} {:<24} {:>14} {:<8} {:>8}'.format(
+            'benchmark', 'params', 'value', 'unit', 'vs base'))
+    for name, params, value, unit in results:
+        base = baseline.get(name + ' ' + params)
+        ratio = '' if base is None else '{:.2f}x'.format(value/base)
+        print('{:<20} {:<24} {:>14.4g} {:<8} {:>8}'.format(
+                name, params, value, unit, ratio))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--quick', action='store_true')
+    parser.add_argument('--only', default='')
+    parser.add_argument('--json', help='save results to compare against later')
+    parser.add_argument('--compare', help='results saved with --json')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {row['name'] + ' ' + row['params']: row['value']
+                        for row in json.load(f)}
+
+    setProgramDefaults()
+    results = []
+    for name, bench in BENCHMARKS:
+        if args.only in name:
+            results.extend(bench(args.quick))
+
+    printTable(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([{'name': name, 'params': params, 'value': value,
+                        'unit': unit}
+                       for name, params, value, unit in results], f, indent=2)
@@ -0,0 +1,304 @@
+import json
+import struct
+import numpy as np
+from lgp.program import Program
+from lgp.team import Team
+from lgp.trainer import Trainer
+from lgp.team_trainer import TeamTrainer
+from lgp.score_table import ScoreTable
+from lgp.result_cache import ResultCache
+from lgp.register_bank import RegisterBank
+from lgp.program_pool import ProgramPool
+
+"""
+Versioned binary checkpoints of a Trainer or TeamTrainer. All genomes are stored
+in one concatenated array with an offsets index, and scores as a (tasks,
+agents) matrix, with settings in a small JSON header. Arrays are read back
+through numpy.memmap, so one program or the scores can be inspected without
+reading the rest.
+
+A file is a sequence of frames, one per saved generation, appended with
+saveCheckpoint(..., append=True). Each frame is:
+
+    prefix: magic b'LGPC', version (uint16), header length (uint32)
+    header: JSON, padded so the data starts 64 byte aligned
+    data: the arrays, each 64 byte aligned, offsets given in the header
+
+Program registers and the result cache contents are not saved. The trainer's
+random streams are, so a loaded trainer carries on exactly as the saved one.
+"""
+
+MAGIC = b'LGPC'
+VERSION = 1
+PREFIX = struct.Struct('<4sHI')
+ALIGN = 64
+
+def alignUp(size):
+    return -(-size//ALIGN)*ALIGN
+
+"""
+Saves the trainer as a frame in fileName, appended to the frames already there
+if append.
+"""
+def saveCheckpoint(fileName, trainer, append=False):
+    config = Program.getConfig()
+    config['teamIdCount'] = Team.idCount
+    header = {
+        'config': config,
+        'curGen': trainer.curGen,
+        'popSize': trainer.popSize,
+        'gap': trainer.gap,
+        'tasks': list(trainer.scoreTable.tasks),
+        'cache': None,
+        'rng': {'entropy': trainer.seedSequence.entropy,
+                'spawnKey': list(trainer.seedSequence.spawn_key),
+                'numSpawned': trainer.seedSequence.n_children_spawned,
+                'state': trainer.rng.bit_generator.state}
+    }
+    if trainer.resultCache is not None:
+        header['cache'] = {'maxSize': trainer.resultCache.maxSize,
+                           'tasks': trainer.resultCache.tasks}
+
+    programs = trainer.programs
+    arrays = packPrograms(programs)
+    if isinstance(trainer, TeamTrainer):
+        header['kind'] = 'TeamTrainer'
+        header['numActions'] = trainer.numActions
+        header['pProgDel'] = trainer.pProgDel
+        header['pProgSwp'] = trainer.pProgSwp
+        header['pProgMut'] = trainer.pProgMut
+
+        agents = trainer.teams
+        progIdxs = {prog.id: i for i, prog in enumerate(programs)}
+        arrays['teamIds'] = np.array([team.id for team in agents], dtype=np.int64)
+        arrays['teamGenCreate'] = np.array([team.genCreate for team in agents],
+                dtype=np.int64)
+        arrays['teamOffsets'] = offsetsOf([len(team.programs) for team in agents])
+        arrays['teamMembers'] = np.array([progIdxs[prog.id]
+                for team in agents for prog in team.programs], dtype=np.int64)
+    else:
+        header['kind'] = 'Trainer'
+        agents = programs
+
+    ids = [agent.id for agent in agents]
+    matrix = trainer.scoreTable.getMatrix(ids, header['tasks'])
+    arrays['scores'] = np.nan_to_num(matrix)
+    arrays['scoresPresent'] = ~np.isnan(matrix)
+
+    with open(fileName, 'ab' if append else 'wb') as f:
+        writeFrame(f, header, arrays)
+
+"""
+Loads the trainer saved in a frame of fileName (the last one by default),
+setting the Program (and Team) class settings back.
+"""
+def loadCheckpoint(fileName, frame=-1):
+    return CheckpointReader(fileName).loadTrainer(frame)
+
+"""
+Sets the trainer's seed sequence and random stream back to where they were
+saved, or new ones for checkpoints saved before trainers had them.
+"""
+def setRngs(trainer, saved):
+    if saved is None:
+        trainer.seedSequence = np.random.SeedSequence()
+        trainer.rng = np.random.default_rng(trainer.seedSequence)
+        return
+
+    trainer.seedSequence = np.random.SeedSequence(saved['entropy'],
+            spawn_key=tuple(saved['spawnKey']),
+            n_children_spawned=saved['numSpawned'])
+    trainer.rng = np.random.default_rng(trainer.seedSequence)
+    trainer.rng.bit_generator.state = saved['state']
+
+def offsetsOf(lengths):
+    offsets = np.zeros(len(lengths)+1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    return offsets
+
+def packPrograms(programs):
+    genomes, offsets = Program.packGenomes(programs)
+    return {
+        'genomes': genomes,
+        'offsets': offsets,
+        'ids': np.array([prog.id for prog in programs], dtype=np.int64),
+        'genCreate': np.array([prog.genCreate for prog in programs],
+                dtype=np.int64)
+    }
+
+def writeFrame(f, header, arrays):
+    descs = {}
+    dataSize = 0
+    for name, arr in arrays.items():
+        descs[name] = {'dtype': arr.dtype.str, 'shape': list(arr.shape),
+                       'offset': dataSize}
+        dataSize = alignUp(dataSize + arr.nbytes)
+    header = dict(header, arrays=descs, dataSize=dataSize)
+
+    headerBytes = json.dumps(header).encode()
+    headerLen = alignUp(PREFIX.size + len(headerBytes)) - PREFIX.size
+    f.write(PREFIX.pack(MAGIC, VERSION, headerLen))
+    f.write(headerBytes.ljust(headerLen, b' '))
+
+    for arr in arrays.values():
+        data = np.ascontiguousarray(arr).tobytes()
+        f.write(data)
+        f.write(b'\0'*(alignUp(len(data)) - len(data)))
+
+"""
+Reads the frames of a checkpoint file. Only the headers are read up front,
+arrays are memory mapped when asked for.
+"""
+class CheckpointReader:
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.headers = [] # header of each frame
+        self.dataStarts = [] # file position of each frame's data
+
+        with open(fileName, 'rb') as f:
+            while True:
+                prefix = f.read(PREFIX.size)
+                if len(prefix) < PREFIX.size:
+                    break
+                magic, version, headerLen = PREFIX.unpack(prefix)
+                if magic != MAGIC:
+                    raise ValueError('Not an lgp checkpoint: ' + fileName)
+                if version != VERSION:
+                    raise ValueError('Unsupported checkpoint version {}.'.format(
+                            version))
+
+                header = json.loads(f.read(headerLen).decode())
+                self.headers.append(header)
+                self.dataStarts.append(f.tell())
+                f.seek(header['dataSize'], 1)
+
+    """
+    Generation of each frame.
+    """
+    def getGenerations(self):
+        return [header['curGen'] for header in self.headers]
+
+    """
+    Read only memory map of one of a frame's arrays.
+    """
+    def getArray(self, name, frame=-1):
+        desc = self.headers[frame]['arrays'][name]
+        shape = tuple(desc['shape'])
+        if np.prod(shape) == 0:
+            return np.zeros(shape, dtype=np.dtype(desc['dtype']))
+        return np.memmap(self.fileName, dtype=np.dtype(desc['dtype']), mode='r',
+                offset=self.dataStarts[frame] + desc['offset'], shape=shape)
+
+    def getNumPrograms(self, frame=-1):
+        return self.headers[frame]['arrays']['ids']['shape'][0]
+
+    """
+    Genome of the index'th program, read from the file.
+    """
+    def getGenome(self, index, frame=-1):
+        offsets = self.getArray('offsets', frame)
+        return np.array(self.getArray('genomes', frame)[
+                offsets[index]:offsets[index+1]])
+
+    """
+    Rebuilds the index'th program of a frame. Uses the current Program
+    settings, call setConfig first to use the saved ones.
+    """
+    def getProgram(self, index, frame=-1):
+        prog = Program(instructions=self.getGenome(index, frame),
+                genCreate=int(self.getArray('genCreate', frame)[index]))
+        prog.id = int(self.getArray('ids', frame)[index])
+        return prog
+
+    """
+    Sets the Program and Team class settings saved in a frame.
+    """
+    def setConfig(self, frame=-1):
+        config = dict(self.headers[frame]['config'])
+        Team.idCount = config.pop('teamIdCount')
+        Program.setConfig(config)
+
+    """
+    Rebuilds the whole trainer saved in a frame.
+    """
+    def loadTrainer(self, frame=-1):
+        header = self.headers[frame]
+        self.setConfig(frame)
+
+        genomes = np.array(self.getArray('genomes', frame))
+        offsets = self.getArray('offsets', frame)
+        ids = self.getArray('ids', frame).tolist()
+        genCreates = self.getArray('genCreate', frame).tolist()
+        programs = []
+        for i, (progId, genCreate) in enumerate(zip(ids, genCreates)):
+            prog = Program(instructions=genomes[offsets[i]:offsets[i+1]],
+                    genCreate=genCreate, decode=False)
+            prog.id = progId
+            programs.append(prog)
+        Program.decodePrograms(programs)
+        # creating programs moved the id count
+        Program.idCount = header['config']['idCount']
+
+        if header['kind'] == 'TeamTrainer':
+            trainer = TeamTrainer.__new__(TeamTrainer)
+            trainer.numActions = header['numActions']
+            trainer.pProgDel = header['pProgDel']
+            trainer.pProgSwp = header['pProgSwp']
+            trainer.pProgMut = header['pProgMut']
+        else:
+            trainer = Trainer.__new__(Trainer)
+
+        trainer.popSize = header['popSize']
+        trainer.gap = header['gap']
+        trainer.curGen = header['curGen']
+        trainer.scoreStats = {}
+        setRngs(trainer, header.get('rng'))
+        trainer.profiler = None
+        trainer.profileStats = {}
+        Program.profiler = None
+        trainer.scoreTable = ScoreTable(capacity=trainer.popSize)
+        trainer.registerBank = RegisterBank(capacity=len(programs))
+        trainer.resultCache = None
+        if header['cache'] is not None:
+            trainer.resultCache = ResultCache(header['cache']['maxSize'],
+                    header['cache']['tasks'])
+
+        if header['kind'] == 'TeamTrainer':
+            for prog in programs:
+                prog.refs = 0
+                trainer.registerBank.acquire(prog)
+            trainer.programs = ProgramPool(programs)
+
+            teamOffsets = self.getArray('teamOffsets', frame)
+            members = self.getArray('teamMembers', frame)
+            teamIds = self.getArray('teamIds', frame).tolist()
+            teamGenCreates = self.getArray('teamGenCreate', frame).tolist()
+            trainer.teams = []
+            trainer.teamsById = {}
+            for i, (teamId, genCreate) in enumerate(zip(teamIds, teamGenCreates)):
+                team = Team(programs=[programs[idx]
+                            for idx in members[teamOffsets[i]:teamOffsets[i+1]]],
+                        genCreate=genCreate)
+                team.id = teamId
+                trainer.teams.append(team)
+                trainer.trackTeam(team)
+            agents = trainer.teams
+            Team.idCount = header['config']['teamIdCount']
+        else:
+            trainer.programs = programs
+            trainer.programsById = {}
+            for prog in programs:
+                trainer.trackProgram(prog)
+            agents = programs
+
+        # scores back into the table
+        agentIds = [agent.id for agent in agents]
+        scores = self.getArray('scores', frame)
+        present = self.getArray('scoresPresent', frame)
+        for row, task in enumerate(header['tasks']):
+            mask = np.array(present[row])
+            trainer.scoreTable.setScores(np.array(agentIds)[mask], [task],
+                    scores[row][mask])
+
+        return trainer
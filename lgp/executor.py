@@ -0,0 +1,211 @@
+import numpy as np
+from lgp.program import Program
+from lgp.kernels import (runPopulation, runTeams, runPopulationBatch,
+        setNumThreads, getNumThreads)
+
+"""
+Executes a whole population of programs in one compiled call, instead of one
+Program.getAction call per program. Built from a list of programs, such as
+Trainer.programs or TeamTrainer.programs:
+
+    executor = PopulationExecutor(trainer.programs)
+    actions = executor.getActions(obs) # (n_programs, numOutRegs)
+
+Registers are copied from the programs when packed, from then on the executor
+keeps the register state of each program itself. Given the trainer's
+registerBank instead, the programs' own registers in the bank are run on
+directly, so they stay in step with Program.getAction.
+
+For offline datasets, getBatchActions runs every program over every row of an
+observation matrix on multiple threads.
+"""
+class PopulationExecutor:
+
+    def __init__(self, programs, registerBank=None):
+        self.registerBank = registerBank
+        self.pack(programs)
+
+    """
+    Packs the instructions of all programs into concatenated arrays, program i's
+    instructions being offsets[i] up to offsets[i+1].
+    """
+    def pack(self, programs):
+        self.programs = list(programs)
+
+        lengths = [len(prog.modes) for prog in self.programs]
+        self.offsets = np.zeros(len(self.programs)+1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(lengths)
+
+        self.modes = np.concatenate(
+            [prog.modes for prog in self.programs] + [np.zeros(0, dtype=bool)])
+        self.ops = np.concatenate(
+            [prog.ops for prog in self.programs] + [np.zeros(0, dtype=np.int8)])
+        self.dests = np.concatenate(
+            [prog.dests for prog in self.programs] + [np.zeros(0, dtype=np.int8)])
+        self.srcs = np.concatenate(
+            [prog.srcs for prog in self.programs] + [np.zeros(0, dtype=np.int32)])
+
+        if self.registerBank is not None:
+            self.registers = self.registerBank.registers
+            self.rows = self.registerBank.getRows(self.programs)
+        else:
+            self.registers = np.zeros((len(self.programs),
+                    Program.numOutRegs+Program.numMemRegs+Program.numFgtRegs))
+            self.rows = np.arange(len(self.programs))
+            for i, prog in enumerate(self.programs):
+                if prog.regs is not None: # not run yet is all zeros
+                    self.registers[i] = prog.regs
+
+    """
+    Produces the actions of every program. obs is either a single observation
+    given to all programs, or a matrix with one observation row per program.
+    actionType 'single' returns the index of the max output register of each
+    program, 'multi' returns all output registers as an (n_programs,
+    numOutRegs) matrix.
+    """
+    def getActions(self, obs, actionType='multi'):
+        obs = np.asarray(obs, dtype=np.float64)
+        if obs.ndim == 1:
+            obs = obs.reshape(1, -1)
+        elif obs.shape[0] != len(self.programs):
+            raise ValueError('Expected 1 or {} observation rows, got {}.'.format(
+                    len(self.programs), obs.shape[0]))
+
+        runPopulation(obs, self.registers, self.rows,
+                self.modes, self.ops, self.dests, self.srcs, self.offsets,
+                Program.numOutRegs+Program.numMemRegs)
+        if Program.profiler is not None:
+            Program.profiler.countRuns(len(self.programs), len(self.modes))
+
+        if actionType == 'multi':
+            return self.registers[self.rows, :Program.numOutRegs]
+        else:
+            return np.argmax(self.registers[self.rows, :Program.numOutRegs],
+                    axis=1)
+
+    """
+    Produces the actions of every program for every row of obsMatrix, each row
+    run independently from the program's current registers as in
+    Program.getActions, which the registers aren't changed by. Returns an
+    (n_programs, n_rows, numOutRegs) array for 'multi', or (n_programs, n_rows)
+    max output indices for 'single'. Programs and rows are split over
+    numThreads threads (see kernels.setNumThreads), by default the current
+    Numba setting, in blocks of rowBlock rows of one program. Not to be called
+    from several Python threads at once on the workqueue threading layer (see
+    lgp.kernels).
+    """
+    def getBatchActions(self, obsMatrix, actionType='multi', numThreads=None,
+            rowBlock=64):
+        obsMatrix = np.asarray(obsMatrix, dtype=np.float64)
+        actions = np.empty((len(self.programs), len(obsMatrix),
+                Program.numOutRegs))
+
+        if numThreads is not None:
+            prevThreads = getNumThreads()
+            setNumThreads(numThreads)
+        try:
+            runPopulationBatch(obsMatrix, self.registers, self.rows,
+                    self.modes, self.ops, self.dests, self.srcs, self.offsets,
+                    Program.numOutRegs+Program.numMemRegs, rowBlock, actions)
+        finally:
+            if numThreads is not None:
+                setNumThreads(prevThreads)
+
+        if Program.profiler is not None:
+            Program.profiler.countRuns(len(self.programs)*len(obsMatrix),
+                    len(self.modes)*len(obsMatrix))
+
+        if actionType == 'multi':
+            return actions
+        else:
+            return np.argmax(actions, axis=2)
+
+    def clearRegisters(self):
+        self.registers[self.rows] = 0
+
+"""
+Executes teams in one compiled call, instead of a Program.getAction call per
+member of each team. The member programs are packed once as in
+PopulationExecutor, a program in several teams only once, and the actions are
+written into a preallocated (n_teams, teamSize) matrix:
+
+    executor = TeamExecutor(trainer.teams, trainer.registerBank)
+    actions = executor.getActions(obs) # row t is trainer.teams[t].getAction(obs)
+
+With dedup, each distinct program runs only once per observation however many
+teams it is in, and its action is gathered into each of those teams. Meant for
+teams all given the same observation, such as lockstep environments. A program
+in several teams then steps its registers once per observation rather than once
+per team.
+"""
+class TeamExecutor(PopulationExecutor):
+
+    def __init__(self, teams, registerBank=None, dedup=False):
+        self.registerBank = registerBank
+        self.dedup = dedup
+        self.packTeams(teams)
+
+    """
+    Packs the distinct member programs, and the members of team t as indices
+    into them, members[teamOffsets[t]] up to members[teamOffsets[t+1]].
+    """
+    def packTeams(self, teams):
+        self.teams = list(teams)
+
+        progIdxs = {} # program id -> index in packed programs
+        programs = []
+        for team in self.teams:
+            for prog in team.programs:
+                if prog.id not in progIdxs:
+                    progIdxs[prog.id] = len(programs)
+                    programs.append(prog)
+        self.pack(programs)
+
+        sizes = [len(team.programs) for team in self.teams]
+        self.teamOffsets = np.zeros(len(self.teams)+1, dtype=np.int64)
+        self.teamOffsets[1:] = np.cumsum(sizes)
+        self.members = np.array([progIdxs[prog.id]
+                for team in self.teams for prog in team.programs], dtype=np.int64)
+
+        self.actions = np.zeros((len(self.teams), max(sizes, default=0)))
+        # where each member's action goes in actions, for dedup
+        self.memberTeams = np.repeat(np.arange(len(self.teams)), sizes)
+        self.memberCols = (np.arange(len(self.members))
+                - np.repeat(self.teamOffsets[:-1], sizes))
+
+    """
+    Produces the actions of every team, as an (n_teams, teamSize) matrix that is
+    overwritten by the next call. obs is either a single observation given to
+    all teams, or a matrix with one observation row per team (not with dedup).
+    """
+    def getActions(self, obs):
+        obs = np.asarray(obs, dtype=np.float64)
+        if obs.ndim == 1:
+            obs = obs.reshape(1, -1)
+        elif self.dedup:
+            raise ValueError('dedup needs a single observation for all teams.')
+        elif obs.shape[0] != len(self.teams):
+            raise ValueError('Expected 1 or {} observation rows, got {}.'.format(
+                    len(self.teams), obs.shape[0]))
+
+        if self.dedup:
+            # each program once, then its action to every team it is in
+            runPopulation(obs, self.registers, self.rows,
+                    self.modes, self.ops, self.dests, self.srcs, self.offsets,
+                    Program.numOutRegs+Program.numMemRegs)
+            if Program.profiler is not None:
+                Program.profiler.countRuns(len(self.programs), len(self.modes))
+            progActions = self.registers[self.rows, 0]
+            self.actions[self.memberTeams, self.memberCols] = \
+                    progActions[self.members]
+            return self.actions
+
+        runTeams(obs, self.registers, self.rows,
+                self.modes, self.ops, self.dests, self.srcs, self.offsets,
+                self.members, self.teamOffsets,
+                Program.numOutRegs+Program.numMemRegs, self.actions)
+        if Program.profiler is not None:
+            Program.profiler.countRuns(len(self.members),
+                    int(np.sum(np.diff(self.offsets)[self.members])))
+
+        return self.actions
@@ -0,0 +1,383 @@
+import math
+import time
+import numpy as np
+import numba
+from numba import njit, prange
+
+"""
+Compiled kernels for executing decoded program instructions. The single program
+path (Program.getAction) and the batched executors share the same instruction
+loop so that results are identical between them.
+
+Kernels are cached on disk (cache=True), so only the first process to use them
+after a change compiles them. warmup compiles or loads them up front for
+float64 observations, rather than in the middle of the first episode.
+
+Parallel kernels run on the threading layer Numba picks (tbb, then omp, then
+workqueue), this module leaves the choice to the application. Under the tbb
+and GNU omp layers, a process that forks after running a parallel kernel can
+hang: a ParallelEvaluator started with the default fork start method after
+calling PopulationExecutor.getBatchActions is the usual case. Either start the
+evaluator's workers with spawn or forkserver (its context argument), or choose
+the workqueue layer with NUMBA_THREADING_LAYER=workqueue or
+numba.config.THREADING_LAYER before the first parallel kernel runs. workqueue
+isn't thread safe though: parallel kernels must then not be called from more
+than one Python thread at a time, or the process aborts.
+"""
+
+"""
+Executes a single instruction on a set of registers.
+"""
+@njit(cache=True)
+def runInstruction(inpt, regs, mode, op, dst, srcIdx):
+    regSize = len(regs)
+    # first get source
+    if mode == False:
+        src = regs[srcIdx%regSize]
+    else:
+        src = inpt[srcIdx%len(inpt)]
+
+    # do operation
+    dest = dst%regSize
+    x = regs[dest]
+    y = src
+    if op == 0:
+        regs[dest] = x+y
+    elif op == 1:
+        regs[dest] = x-y
+    elif op == 2:
+        regs[dest] = x*y
+    elif op == 3:
+        if y != 0:
+            regs[dest] = x/y
+    elif op == 4:
+        regs[dest] = math.cos(y)
+    elif op == 5:
+        if y > 0:
+            regs[dest] = math.log(y)
+    elif op == 6:
+        regs[dest] = math.exp(y)
+    elif op == 7:
+        if x < y:
+            regs[dest] = x*(-1)
+
+    if math.isnan(regs[dest]):
+        regs[dest] = 0
+    elif regs[dest] == np.inf:
+        regs[dest] = np.finfo(np.float64).max
+    elif regs[dest] == -np.inf:
+        regs[dest] = np.finfo(np.float64).min
+
+"""
+Runs instructions start up to end on one set of registers.
+"""
+@njit(cache=True)
+def runInstructions(inpt, regs, modes, ops, dsts, srcs, start, end):
+    for i in range(start, end):
+        runInstruction(inpt, regs, modes[i], ops[i], dsts[i], srcs[i])
+
+"""
+Splits a program's packed decoded code (see Program.packCode) into its srcs,
+modes, ops and dests arrays, as views.
+"""
+@njit(cache=True)
+def unpackCode(code):
+    n = len(code)//7
+    srcs = code[:4*n].view(np.int32)
+    modes = code[4*n:5*n].view(np.bool_)
+    ops = code[5*n:6*n].view(np.int8)
+    dsts = code[6*n:].view(np.int8)
+    return modes, ops, dsts, srcs
+
+"""
+Runs a program's packed decoded code on one set of registers.
+"""
+@njit(cache=True)
+def runCode(inpt, regs, code):
+    modes, ops, dsts, srcs = unpackCode(code)
+    runInstructions(inpt, regs, modes, ops, dsts, srcs, 0, len(modes))
+
+"""
+Runs every program of a packed population once. Program p's instructions are
+offsets[p] up to offsets[p+1] of the concatenated arrays, and its registers are
+row regRows[p] of regs. obs has a single row shared by all programs, or one row
+per program.
+"""
+@njit(cache=True)
+def runPopulation(obs, regs, regRows, modes, ops, dsts, srcs, offsets,
+        fgtStart):
+    shared = obs.shape[0] == 1
+    for p in range(len(offsets)-1):
+        progRegs = regs[regRows[p]]
+        # reset fgt registers
+        progRegs[fgtStart:] = 0
+
+        if shared:
+            row = 0
+        else:
+            row = p
+
+        runInstructions(obs[row], progRegs, modes, ops, dsts, srcs,
+                offsets[p], offsets[p+1])
+
+"""
+Runs every team of a packed set of teams once. Team t's members are
+members[teamOffsets[t]] up to members[teamOffsets[t+1]], indices of programs
+packed as in runPopulation. Members run in order, each on its own register row
+(so a program in several teams, or twice in one, carries its registers over),
+and member k's action, its first register, goes to out[t, k].
+"""
+@njit(cache=True)
+def runTeams(obs, regs, regRows, modes, ops, dsts, srcs, offsets, members,
+        teamOffsets, fgtStart, out):
+    shared = obs.shape[0] == 1
+    for t in range(len(teamOffsets)-1):
+        if shared:
+            row = 0
+        else:
+            row = t
+
+        for k in range(teamOffsets[t], teamOffsets[t+1]):
+            p = members[k]
+            progRegs = regs[regRows[p]]
+            # reset fgt registers
+            progRegs[fgtStart:] = 0
+            runInstructions(obs[row], progRegs, modes, ops, dsts, srcs,
+                    offsets[p], offsets[p+1])
+            out[t, k-teamOffsets[t]] = progRegs[0]
+
+"""
+Runs one program over every row of obs independently, column-wise: each
+instruction is applied to all rows before moving on to the next. regs has one
+row of registers per observation, already set to the starting state.
+"""
+@njit(cache=True)
+def runBatch(obs, regs, modes, ops, dsts, srcs):
+    for i in range(len(modes)):
+        for r in range(obs.shape[0]):
+            runInstruction(obs[r], regs[r], modes[i], ops[i], dsts[i], srcs[i])
+
+"""
+Runs one program over the rows of obs in order, carrying registers over from
+one row to the next like repeated calls to Program.getAction. The output
+registers after each row are written to the matching row of out.
+"""
+@njit(cache=True)
+def runSequence(obs, regs, out, modes, ops, dsts, srcs, fgtStart):
+    numOut = out.shape[1]
+    for r in range(obs.shape[0]):
+        # reset fgt registers
+        regs[fgtStart:] = 0
+        runInstructions(obs[r], regs, modes, ops, dsts, srcs, 0, len(modes))
+        out[r] = regs[:numOut]
+
+"""
+Runs every program of a packed population (as in runPopulation) over every row
+of obs independently, like Program.getActions, on Numba's threads. Work is split
+into (program, block of rowBlock rows) items so that both many programs and
+many rows spread over the threads. Each item runs column-wise on its own block
+of registers, starting from the program's row regRows[p] of regs with the fgt
+registers at 0, and writes its output registers to out[p, rows].
+"""
+@njit(cache=True, parallel=True)
+def runPopulationBatch(obs, regs, regRows, modes, ops, dsts, srcs, offsets,
+        fgtStart, rowBlock, out):
+    numProgs = len(offsets)-1
+    numBlocks = (obs.shape[0] + rowBlock - 1)//rowBlock
+    numOut = out.shape[2]
+    for item in prange(numProgs*numBlocks):
+        p = item//numBlocks
+        start = (item%numBlocks)*rowBlock
+        end = min(start + rowBlock, obs.shape[0])
+
+        # thread local registers
+        block = np.zeros((end-start, regs.shape[1]))
+        for r in range(end-start):
+            block[r, :fgtStart] = regs[regRows[p], :fgtStart]
+
+        for i in range(offsets[p], offsets[p+1]):
+            for r in range(end-start):
+                runInstruction(obs[start+r], block[r], modes[i], ops[i],
+                        dsts[i], srcs[i])
+
+        for r in range(end-start):
+            out[p, start+r] = block[r, :numOut]
+
+"""
+Sets the number of threads parallel kernels use in the calling thread, at most
+the size of Numba's thread pool (NUMBA_NUM_THREADS, by default the number of
+cores). None uses all of them. Returns the number set.
+"""
+def setNumThreads(numThreads=None):
+    maxThreads = numba.config.NUMBA_NUM_THREADS
+    if numThreads is None:
+        numThreads = maxThreads
+    numThreads = max(1, min(numThreads, maxThreads))
+    numba.set_num_threads(numThreads)
+    return numThreads
+
+def getNumThreads():
+    return numba.get_num_threads()
+
+"""
+Backward effective code analysis. Marks the instructions that can affect the
+first numLive registers (the ones that outlive a run) at the end of the
+program, the rest are introns and can be skipped without changing results.
+"""
+@njit(cache=True)
+def markEffective(modes, ops, dsts, srcs, regSize, numLive):
+    live = np.zeros(regSize, dtype=np.bool_)
+    live[:numLive] = True
+    effective = np.zeros(len(modes), dtype=np.bool_)
+    for i in range(len(modes)-1, -1, -1):
+        dest = dsts[i]%regSize
+        op = ops[i]
+        if not live[dest] or op < 0 or op > 7:
+            continue # result never used, or no operation
+
+        effective[i] = True
+        # cos and exp overwrite dest, every other op also reads it
+        if op == 4 or op == 6:
+            live[dest] = False
+        if modes[i] == False:
+            live[srcs[i]%regSize] = True
+
+    return effective
+
+"""
+markEffective for every program of a packed population, program p's
+instructions being offsets[p] up to offsets[p+1].
+"""
+@njit(cache=True)
+def markEffectivePrograms(modes, ops, dsts, srcs, offsets, regSize, numLive):
+    effective = np.zeros(len(modes), dtype=np.bool_)
+    for p in range(len(offsets)-1):
+        start, end = offsets[p], offsets[p+1]
+        effective[start:end] = markEffective(modes[start:end], ops[start:end],
+                dsts[start:end], srcs[start:end], regSize, numLive)
+    return effective
+
+"""
+Applies the program mutation operators to a genome array in the same order and
+with the same chances as Program.mutate, from pre-drawn uniform numbers. draws
+is (4, len(insts), 3): one row per operator (delete, swap, mutate, add) and one
+entry per trial, holding the decision and up to 2 index/bit picks. newInsts
+holds the instruction to insert for each add trial.
+"""
+@njit(cache=True)
+def mutateInstructions(insts, draws, newInsts, pDel, pSwp, pMut, pAdd,
+        maxProgSize):
+    oLen = len(insts)
+    buf = np.empty(max(oLen, maxProgSize), dtype=insts.dtype)
+    buf[:oLen] = insts
+    n = oLen
+    changed = False
+
+    # Deleting
+    for i in range(oLen):
+        if n > 1 and draws[0, i, 0] < pDel:
+            idx = int(draws[0, i, 1]*n)
+            for j in range(idx, n-1):
+                buf[j] = buf[j+1]
+            n -= 1
+            changed = True
+
+    # Swapping
+    for i in range(oLen):
+        if draws[1, i, 0] < pSwp and n >= 2:
+            idx1 = int(draws[1, i, 1]*n)
+            idx2 = int(draws[1, i, 2]*(n-1))
+            if idx2 >= idx1: # make sure different
+                idx2 += 1
+            tmp = buf[idx1]
+            buf[idx1] = buf[idx2]
+            buf[idx2] = tmp
+            changed = True
+
+    # Mutating, flip a random bit within the instruction's bit length
+    for i in range(oLen):
+        if draws[2, i, 0] < pMut:
+            idx = int(draws[2, i, 1]*n)
+            inst = np.int64(buf[idx])
+            bitLen = 1
+            while (inst >> bitLen) > 0:
+                bitLen += 1
+            bit = int(draws[2, i, 2]*bitLen)
+            buf[idx] = inst ^ (np.int64(1) << bit)
+            changed = True
+
+    # Adding, never at the very end, same as the list version
+    for i in range(oLen):
+        if n < maxProgSize and draws[3, i, 0] < pAdd:
+            idx = int(draws[3, i, 1]*n)
+            for j in range(n, idx, -1):
+                buf[j] = buf[j-1]
+            buf[idx] = newInsts[i]
+            n += 1
+            changed = True
+
+    return buf[:n].copy(), changed
+
+"""
+mutateInstructions for many genomes, concatenated with genome g being
+offsets[g] up to offsets[g+1] of insts and of the draws and newInsts. Returns
+the mutated genomes concatenated the same way, their offsets, and whether each
+changed. Releases the GIL, so chunks can be mutated on threads.
+"""
+@njit(cache=True, nogil=True)
+def mutateGenomes(insts, offsets, draws, newInsts, pDel, pSwp, pMut, pAdd,
+        maxProgSize):
+    numGenomes = len(offsets)-1
+    size = 0
+    for g in range(numGenomes):
+        size += max(offsets[g+1] - offsets[g], maxProgSize)
+    out = np.empty(size, dtype=insts.dtype)
+    outOffsets = np.zeros(numGenomes+1, dtype=np.int64)
+    changed = np.zeros(numGenomes, dtype=np.bool_)
+
+    for g in range(numGenomes):
+        start, end = offsets[g], offsets[g+1]
+        genome, changed[g] = mutateInstructions(insts[start:end],
+                draws[:, start:end], newInsts[start:end], pDel, pSwp, pMut, pAdd,
+                maxProgSize)
+        outOffsets[g+1] = outOffsets[g] + len(genome)
+        out[outOffsets[g]:outOffsets[g+1]] = genome
+
+    return out[:outOffsets[-1]], outOffsets, changed
+
+"""
+Compiles (or loads from the cache) every kernel for float64 observations and
+registers, with the argument types the programs, executors and array genome
+mutation use. Returns the seconds taken.
+"""
+def warmup():
+    start = time.perf_counter()
+
+    obs = np.zeros((1, 1))
+    regs = np.zeros((1, 1))
+    rows = np.zeros(1, dtype=np.int64)
+    modes = np.zeros(1, dtype=np.bool_)
+    ops = np.zeros(1, dtype=np.int8)
+    dsts = np.zeros(1, dtype=np.int8)
+    srcs = np.zeros(1, dtype=np.int32)
+    offsets = np.array([0, 1], dtype=np.int64)
+    code = np.zeros(7, dtype=np.uint8)
+
+    runCode(obs[0], regs[0], code)
+    runPopulation(obs, regs, rows, modes, ops, dsts, srcs, offsets, 1)
+    runTeams(obs, regs, rows, modes, ops, dsts, srcs, offsets, rows, offsets,
+            1, np.zeros((1, 1)))
+    runBatch(obs, regs, modes, ops, dsts, srcs)
+    runPopulationBatch(obs, regs, rows, modes, ops, dsts, srcs, offsets, 1, 1,
+            np.zeros((1, 1, 1)))
+    runSequence(obs, regs[0], np.zeros((1, 1)), modes, ops, dsts, srcs, 1)
+    markEffective(modes, ops, dsts, srcs, 1, 1)
+    markEffectivePrograms(modes, ops, dsts, srcs, offsets, 1, 1)
+    for dtype in [np.uint32, np.uint64]:
+        insts = np.zeros(1, dtype=dtype)
+        mutateInstructions(insts, np.ones((4, 1, 3)), insts, 0.1, 0.1, 0.1, 0.1,
+                1)
+        mutateGenomes(insts, offsets, np.ones((4, 1, 3)), insts, 0.1, 0.1, 0.1,
+                0.1, 1)
+
+    return time.perf_counter() - start
@@ -0,0 +1,19 @@
+import importlib.util
+import sys
+
+"""
+Module that is only really imported on first attribute access, so that modules
+which only need it on some paths (like numba kernels when just loading saved
+agents) don't pay for the import up front.
+"""
+def lazyImport(name):
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
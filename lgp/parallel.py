@@ -0,0 +1,212 @@
+import multiprocessing as mp
+import queue
+from lgp.program import Program
+from lgp import kernels
+from lgp.team import Team
+from lgp.team_trainer import TeamTrainer
+from lgp.shared_store import SharedPopulationStore, SharedPopulationReader
+
+"""
+Evaluates the agents of a Trainer or TeamTrainer on a pool of long lived worker
+processes. Only program ids and genome arrays are sent to the workers, which
+rebuild the agents, run the user's episode function on them and send back
+(id, outcomes) pairs to be applied to the trainer. The episode function takes
+an agent (Program or Team) and returns a dict of task to score, and must be
+picklable (defined at module level):
+
+    def runEpisode(agent):
+        ...
+        return {'someTask': score}
+
+    with ParallelEvaluator(runEpisode, numWorkers=8) as evaluator:
+        while True:
+            evaluator.evaluate(trainer)
+            trainer.evolve(tasks='someTask')
+
+For steady state evolution, evolveSteadyState keeps the workers busy with
+agents from a SteadyStateEvolver instead.
+
+Workers compile the program kernels once when started and keep them for their
+whole life. With sharedStore, the genomes are published once per evaluate into
+shared memory and jobs only carry ids, workers reading the genomes zero-copy.
+
+Each worker runs parallel kernels (PopulationExecutor.getBatchActions) on
+threadsPerWorker threads, 1 by default so that the workers together don't
+oversubscribe the cores. Use fewer workers with more threads each for episode
+functions that evaluate whole datasets.
+
+context is the multiprocessing context or start method name the workers are
+started with, the default start method if None. Use 'spawn' or 'forkserver' if
+the process runs parallel kernels itself on the tbb or omp threading layer,
+forking it can hang then (see lgp.kernels).
+"""
+class ParallelEvaluator:
+
+    def __init__(self, episodeFn, numWorkers=None, sharedStore=False,
+            threadsPerWorker=1, context=None):
+        self.episodeFn = episodeFn
+        if context is None or isinstance(context, str):
+            context = mp.get_context(context)
+        self.context = context
+        self.numWorkers = numWorkers or mp.cpu_count()
+        self.threadsPerWorker = threadsPerWorker
+        self.pool = None
+        self.store = SharedPopulationStore() if sharedStore else None
+
+    """
+    Starts the workers, with the current program settings. Done automatically
+    by evaluate, call again to restart the workers if Program settings change.
+    """
+    def start(self):
+        self.close()
+        self.pool = self.context.Pool(self.numWorkers, initializer=initWorker,
+                initargs=(self.episodeFn, Program.getConfig(),
+                        self.threadsPerWorker))
+
+    """
+    Runs the episode function on every agent of the trainer that doesn't have
+    a score for all of skipTasks yet, and applies the scores to the trainer.
+    Returns the list of (id, outcomes).
+    """
+    def evaluate(self, trainer, skipTasks=[]):
+        if self.pool is None:
+            self.start()
+
+        agents = [agent for agent in trainer.getAgents()
+                    if len(skipTasks) == 0
+                        or any(task not in agent.outcomes for task in skipTasks)]
+
+        if self.store is not None:
+            storeName = self.store.publish(trainer.programs)
+            if isinstance(trainer, TeamTrainer):
+                jobs = [(storeName, team.id, [prog.id for prog in team.programs])
+                        for team in agents]
+                fn = runSharedTeamJob
+            else:
+                jobs = [(storeName, prog.id) for prog in agents]
+                fn = runSharedProgramJob
+        elif isinstance(trainer, TeamTrainer):
+            jobs = [(team.id, [(prog.id, prog.getGenome())
+                                    for prog in team.programs])
+                    for team in agents]
+            fn = runTeamJob
+        else:
+            jobs = [(prog.id, prog.getGenome()) for prog in agents]
+            fn = runProgramJob
+
+        chunkSize = max(1, len(jobs)//(self.numWorkers*4))
+        results = self.pool.map(fn, jobs, chunksize=chunkSize)
+
+        trainer.applyScores(results)
+
+        return results
+
+    """
+    Evaluates agents handed out by a SteadyStateEvolver, keeping up to two jobs
+    per worker in flight and telling the evolver each score as soon as it comes
+    back, until numEvals scores have been told.
+    """
+    def evolveSteadyState(self, evolver, numEvals):
+        if self.pool is None:
+            self.start()
+
+        isTeams = isinstance(evolver.trainer, TeamTrainer)
+        results = queue.Queue()
+        numInFlight = 0
+        numTold = 0
+        while numTold < numEvals:
+            numCounted = evolver.numTold
+            while (numInFlight < 2*self.numWorkers
+                    and numTold + numInFlight < numEvals):
+                agent = evolver.ask()
+                if agent is None: # wait for scores to breed from
+                    break
+                if isTeams:
+                    job = (agent.id, [(prog.id, prog.getGenome())
+                                        for prog in agent.programs])
+                    fn = runTeamJob
+                else:
+                    job = (agent.id, agent.getGenome())
+                    fn = runProgramJob
+                self.pool.apply_async(fn, (job,), callback=results.put,
+                        error_callback=results.put)
+                numInFlight += 1
+
+            if numInFlight == 0:
+                # children bred with cached scores only, ask again
+                if evolver.numTold > numCounted:
+                    continue
+                raise ValueError('Not enough scored agents to breed from.')
+
+            result = results.get()
+            numInFlight -= 1
+            if isinstance(result, BaseException):
+                raise result
+            evolver.tell(*result)
+            numTold += 1
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.store is not None:
+            self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+"""
+Worker side state and functions.
+"""
+workerEpisodeFn = None
+workerReader = None # reader of the latest shared store block
+
+def initWorker(episodeFn, config, numThreads):
+    global workerEpisodeFn
+    workerEpisodeFn = episodeFn
+    Program.setConfig(config)
+    kernels.setNumThreads(numThreads)
+
+    # compile (or load cached) kernels now rather than in the first episode
+    kernels.warmup()
+
+def rebuildProgram(progId, instructions):
+    prog = Program(instructions=instructions)
+    prog.id = progId
+    return prog
+
+def runProgramJob(job):
+    progId, instructions = job
+    return progId, workerEpisodeFn(rebuildProgram(progId, instructions))
+
+def runTeamJob(job):
+    teamId, progs = job
+    team = Team(programs=[rebuildProgram(progId, instructions)
+                            for progId, instructions in progs])
+    team.id = teamId
+    return teamId, workerEpisodeFn(team)
+
+def getReader(storeName):
+    global workerReader
+    if workerReader is None or workerReader.name != storeName:
+        if workerReader is not None:
+            workerReader.close()
+        workerReader = SharedPopulationReader(storeName)
+    return workerReader
+
+def runSharedProgramJob(job):
+    storeName, progId = job
+    genome = getReader(storeName).getGenome(progId)
+    return progId, workerEpisodeFn(rebuildProgram(progId, genome))
+
+def runSharedTeamJob(job):
+    storeName, teamId, progIds = job
+    reader = getReader(storeName)
+    team = Team(programs=[rebuildProgram(progId, reader.getGenome(progId))
+                            for progId in progIds])
+    team.id = teamId
+    return teamId, workerEpisodeFn(team)
@@ -0,0 +1,192 @@
+import numpy as np
+from numba import njit
+
+"""
+Multi-objective ranking on a (n_agents, n_objectives) score matrix, higher
+scores being better. Dominance counting, fast non-dominated sorting into fronts
+and crowding distance, as used by the pareto score types of Trainer.
+"""
+
+"""
+Counts for each agent i, in one pass over all pairs: how many other agents it
+scores at least as well as on every objective (dominates), and how many other
+agents score strictly better than it on every objective (dominatedBy).
+"""
+@njit(cache=True)
+def countDominance(scores):
+    n, k = scores.shape
+    dominates = np.zeros(n, dtype=np.int64)
+    dominatedBy = np.zeros(n, dtype=np.int64)
+    for i in range(n):
+        for j in range(i+1, n):
+            iGe = True # i >= j on all
+            jGe = True # j >= i on all
+            iGt = True # i > j on all
+            jGt = True # j > i on all
+            for o in range(k):
+                a = scores[i, o]
+                b = scores[j, o]
+                if a < b:
+                    iGe = False
+                    iGt = False
+                elif a > b:
+                    jGe = False
+                    jGt = False
+                else:
+                    iGt = False
+                    jGt = False
+            if iGe:
+                dominates[i] += 1
+            if jGe:
+                dominates[j] += 1
+            if jGt:
+                dominatedBy[i] += 1
+            if iGt:
+                dominatedBy[j] += 1
+
+    return dominates, dominatedBy
+
+"""
+Whether a pareto dominates b: at least as good on all objectives and better on
+at least one.
+"""
+@njit(cache=True)
+def paretoDominates(scores, a, b):
+    better = False
+    for o in range(scores.shape[1]):
+        if scores[a, o] < scores[b, o]:
+            return False
+        elif scores[a, o] > scores[b, o]:
+            better = True
+    return better
+
+"""
+Efficient non-dominated sort with binary search over fronts. Agents are visited
+in descending lexicographic order, so an agent can only be dominated by agents
+visited before it. If an agent is dominated by some member of front f it is
+dominated by some member of every front before f too, which makes a binary
+search over the fronts valid. Fronts are kept as linked lists of their members.
+"""
+@njit(cache=True)
+def sortFronts(scores, order):
+    n = len(order)
+    ranks = np.zeros(n, dtype=np.int64)
+    frontLast = np.empty(n, dtype=np.int64) # last member added to each front
+    prevMember = np.empty(n, dtype=np.int64) # previous member in same front
+    numFronts = 0
+    for idx in order:
+        lo = 0
+        hi = numFronts
+        while lo < hi: # first front with no member dominating idx
+            mid = (lo+hi)//2
+            dominated = False
+            member = frontLast[mid]
+            while member != -1:
+                if paretoDominates(scores, member, idx):
+                    dominated = True
+                    break
+                member = prevMember[member]
+            if dominated:
+                lo = mid+1
+            else:
+                hi = mid
+
+        if lo == numFronts:
+            frontLast[lo] = -1
+            numFronts += 1
+        prevMember[idx] = frontLast[lo]
+        frontLast[lo] = idx
+        ranks[idx] = lo
+
+    return ranks
+
+"""
+O(N log N) non-dominated sort for 2 objectives. Visiting agents by descending
+first objective (then second), the second objective of the last agent added to
+each front is non-increasing over the fronts, so the front for each agent is
+found with a binary search.
+"""
+@njit(cache=True)
+def sortFronts2(scores, order):
+    n = len(order)
+    ranks = np.zeros(n, dtype=np.int64)
+    frontLast = np.empty(n, dtype=np.int64)
+    numFronts = 0
+    prev = -1
+    for idx in order:
+        if (prev != -1 and scores[prev, 0] == scores[idx, 0]
+                and scores[prev, 1] == scores[idx, 1]):
+            front = ranks[prev] # duplicate goes with its twin
+        else:
+            lo = 0
+            hi = numFronts
+            while lo < hi: # first front whose last member has lower 2nd score
+                mid = (lo+hi)//2
+                if scores[frontLast[mid], 1] >= scores[idx, 1]:
+                    lo = mid+1
+                else:
+                    hi = mid
+            front = lo
+            if front == numFronts:
+                numFronts += 1
+            frontLast[front] = idx
+
+        ranks[idx] = front
+        prev = idx
+
+    return ranks
+
+"""
+Front index of each agent, 0 being the non-dominated front.
+"""
+def nonDominatedSort(scores):
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # descending lexicographic order, first objective first
+    order = np.lexsort(-scores.T[::-1])
+    if scores.shape[1] == 2:
+        return sortFronts2(scores, order)
+    else:
+        return sortFronts(scores, order)
+
+"""
+NSGA-II crowding distance of each agent within its front. Agents at the edges
+of a front on any objective get infinite distance.
+"""
+def crowdingDistance(scores, ranks):
+    scores = np.asarray(scores, dtype=np.float64)
+    distances = np.zeros(len(scores))
+    for front in np.unique(ranks):
+        members = np.flatnonzero(ranks == front)
+        if len(members) <= 2:
+            distances[members] = np.inf
+            continue
+
+        for o in range(scores.shape[1]):
+            objScores = scores[members, o]
+            order = np.argsort(objScores, kind='stable')
+            sortedScores = objScores[order]
+            span = sortedScores[-1] - sortedScores[0]
+
+            distances[members[order[0]]] = np.inf
+            distances[members[order[-1]]] = np.inf
+            if span > 0:
+                distances[members[order[1:-1]]] += (
+                        sortedScores[2:] - sortedScores[:-2])/span
+
+    return distances
+
+"""
+Sorts agents by front, and by descending crowding distance within fronts.
+"""
+def paretoRank(agents, scores, reverse=True):
+    scores = np.asarray(scores, dtype=np.float64)
+    ranks = nonDominatedSort(scores)
+    distances = crowdingDistance(scores, ranks)
+    order = np.lexsort((-distances, ranks))
+    if not reverse:
+        order = order[::-1]
+
+    return [agents[i] for i in order]
@@ -0,0 +1,144 @@
+import contextlib
+import csv
+import json
+import time
+import tracemalloc
+
+"""
+Opt in per generation instrumentation of the trainers. Given to a trainer as
+Trainer(..., profiler=Profiler()), it records the wall time of each phase of
+evolve, counts (programs and instructions executed, mutations), program lengths
+and optionally allocated bytes, with one record per generation:
+
+    trainer.profileStats # record of the last generation
+    trainer.profiler.toCSV('profile.csv')
+
+Time spent between evolve calls, running the agents, is recorded as the
+'evaluate' phase. Phases can be nested, an outer phase's time includes the
+inner ones. Without a profiler the instrumentation is a None check.
+"""
+class Profiler:
+
+    def __init__(self, trackAllocations=False):
+        self.trackAllocations = trackAllocations
+        # tracemalloc slows everything down, close stops it if started here
+        self.startedTracing = trackAllocations and not tracemalloc.is_tracing()
+        if self.startedTracing:
+            tracemalloc.start()
+
+        self.history = [] # record of each generation
+        self.reset()
+
+    """
+    Stops allocation tracking. Records can still be exported.
+    """
+    def close(self):
+        if self.startedTracing:
+            tracemalloc.stop()
+            self.startedTracing = False
+        self.trackAllocations = False
+
+    def reset(self):
+        self.times = {} # phase -> seconds
+        self.allocated = {} # phase -> net bytes allocated
+        self.counts = {}
+        self.start = time.perf_counter()
+
+    """
+    Context manager timing a phase, added up over every time it is entered in
+    the generation.
+    """
+    @contextlib.contextmanager
+    def phase(self, name):
+        if self.trackAllocations:
+            startBytes = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = (self.times.get(name, 0)
+                    + time.perf_counter() - start)
+            if self.trackAllocations:
+                self.allocated[name] = (self.allocated.get(name, 0)
+                        + tracemalloc.get_traced_memory()[0] - startBytes)
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    """
+    Counts numRuns program executions of numInsts instructions in total.
+    """
+    def countRuns(self, numRuns, numInsts):
+        self.count('programsExecuted', numRuns)
+        self.count('instructionsExecuted', numInsts)
+
+    """
+    Ends the generation, returning its record and adding it to the history.
+    programs are measured for their lengths.
+    """
+    def endGeneration(self, generation, programs):
+        evolveTime = self.times.get('evolve', 0)
+        times = dict(self.times)
+        times['evaluate'] = time.perf_counter() - self.start - evolveTime
+
+        lengths = [len(prog.instructions) for prog in programs]
+        effLengths = [len(prog.modes) for prog in programs]
+        record = {
+            'generation': generation,
+            'time': times,
+            'counts': dict(self.counts),
+            'programs': {
+                'count': len(lengths),
+                'meanLength': sum(lengths)/max(len(lengths), 1),
+                'meanEffectiveLength': sum(effLengths)/max(len(effLengths), 1)
+            }
+        }
+        if self.trackAllocations:
+            record['allocated'] = dict(self.allocated)
+
+        self.history.append(record)
+        self.reset()
+
+        return record
+
+    """
+    History as flat rows, nested keys joined with dots.
+    """
+    def getRows(self):
+        rows = []
+        for record in self.history:
+            row = {}
+            for key, value in record.items():
+                if isinstance(value, dict):
+                    for name, subValue in value.items():
+                        row[key + '.' + name] = subValue
+                else:
+                    row[key] = value
+            rows.append(row)
+
+        return rows
+
+    def toCSV(self, fileName):
+        rows = self.getRows()
+        fields = []
+        for row in rows:
+            fields.extend(field for field in row if field not in fields)
+
+        with open(fileName, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def toJSON(self, fileName):
+        with open(fileName, 'w') as f:
+            json.dump(self.history, f, indent=2)
+
+noPhase = contextlib.nullcontext()
+
+"""
+profiler.phase(name), or a shared do nothing context if profiler is None.
+"""
+def phase(profiler, name):
+    if profiler is None:
+        return noPhase
+    return profiler.phase(name)
@@ -1,13 +1,19 @@
-import random
+import hashlib
 import numpy as np
-from numba import njit
-import math
+from lgp.lazy_import import lazyImport
+
+# numba is only imported once a program is decoded or run
+kernels = lazyImport('lgp.kernels')
 
 """
 A program which contains multiple instructions, each of which performing some
-operation on some registers/inputs.
+operation on some registers/inputs. Slotted to keep large populations small,
+registers are only allocated once the program runs.
 """
 class Program:
+    __slots__ = ('instructions', 'id', 'genCreate', 'code', 'regs', 'outcomes',
+                 'fitness', 'refs')
+
     maxProgSize = 128
 
     numOutRegs = 8 # registers that are mapped to outputs after running
@@ -22,6 +28,15 @@ class Program:
 
     idCount = 0 # unique numeric id of program, incrementing on each new one
 
+    # store instructions in a numpy array rather than a list, and mutate them
+    # in a compiled kernel
+    arrayGenome = False
+    # random stream of programs created or mutated without one given, trainers
+    # give their own
+    rng = np.random.default_rng()
+
+    profiler = None # set by a trainer with a Profiler, counts executions
+
     """
     bits for:
     mode   op    dest       src
@@ -37,16 +52,29 @@ class Program:
     """
     instLengths = [1,3,5,23]
 
-    def __init__(self, program=None, progSize=-1, genCreate=0):
+    """
+    Copies program, rebuilds a program from its instructions, or creates a new
+    random one of progSize instructions (from rng, Program.rng if None). With
+    decode False the instructions are left to be decoded later, for decoding
+    many programs at once (see decodePrograms).
+    """
+    def __init__(self, program=None, progSize=-1, genCreate=0, instructions=None,
+            rng=None, decode=True):
+        if rng is None:
+            rng = Program.rng
         if progSize == -1:
             progSize = Program.maxProgSize
 
         if program is not None: # copy existing program (probably to be mutated)
-            self.instructions = list(program.instructions)
+            self.instructions = Program.copyInstructions(program.instructions)
+        elif instructions is not None: # rebuild program from its genome
+            self.instructions = Program.copyInstructions(instructions)
         else: # create brand new program, all new instructions
             Program.maxInst = 2**sum(Program.instLengths)-1
-            self.instructions = [random.randint(0,Program.maxInst)
-                                 for _ in range(progSize)]
+            self.instructions = rng.integers(0, Program.maxInst, size=progSize,
+                    dtype=Program.genomeDtype(), endpoint=True)
+            if not Program.arrayGenome:
+                self.instructions = self.instructions.tolist()
 
         # give a new id
         self.id = Program.idCount
@@ -54,17 +82,51 @@ class Program:
 
         self.genCreate = genCreate
 
-        # initialize registers
-        self.registers = np.zeros(Program.numOutRegs+Program.numMemRegs+
-                Program.numFgtRegs)
+        # registers, allocated on first use
+        self.regs = None
 
         # store instructions in a way for fast execution
-        self.extractInstructionsData()
+        self.code = None
+        if decode:
+            self.extractInstructionsData()
 
         self.outcomes = {} # stores rewards for tasks
 
         self.fitness = None
 
+        self.refs = 0 # number of teams this program is in
+
+    """
+    The program's registers, allocated (zeroed) on first access.
+    """
+    @property
+    def registers(self):
+        if self.regs is None:
+            self.regs = np.zeros(Program.numOutRegs+Program.numMemRegs+
+                    Program.numFgtRegs)
+        return self.regs
+
+    @registers.setter
+    def registers(self, registers):
+        self.regs = registers
+
+    # views of the decoded effective instructions in code
+    @property
+    def modes(self):
+        return self.code[4*len(self.code)//7:5*len(self.code)//7].view(bool)
+
+    @property
+    def ops(self):
+        return self.code[5*len(self.code)//7:6*len(self.code)//7].view(np.int8)
+
+    @property
+    def dests(self):
+        return self.code[6*len(self.code)//7:].view(np.int8)
+
+    @property
+    def srcs(self):
+        return self.code[:4*len(self.code)//7].view(np.int32)
+
     """
     Produces an action based on the observation and state of registers.
     actionType 'single' returns the index of the max output register, 'multi'
@@ -74,24 +136,70 @@ class Program:
         # reset fgt registers
         self.clearRegisters(clearAll=False)
 
-        Program.run(obs, self.registers,
-                self.modes, self.ops, self.dests, self.srcs)
+        kernels.runCode(obs, self.registers, self.code)
+        if Program.profiler is not None:
+            Program.profiler.countRuns(1, len(self.code)//7)
 
         if actionType == 'multi':
             return self.registers[:Program.numOutRegs]
         else:
             return np.argmax(self.registers[:Program.numOutRegs])
 
+    """
+    Produces an action for each row of an (N, obsDim) observation matrix in one
+    compiled call. If sequential, rows are treated as consecutive steps and
+    registers carry over from one row to the next (the program's registers are
+    updated, same as N calls to getAction). Otherwise each row is run
+    independently from the program's current registers, which are left
+    untouched. actionType is as in getAction, giving an (N, numOutRegs) matrix
+    for 'multi'.
+    """
+    def getActions(self, obsMatrix, actionType='multi', sequential=False):
+        obsMatrix = np.asarray(obsMatrix, dtype=np.float64)
+        fgtStart = Program.numOutRegs+Program.numMemRegs
+
+        if sequential:
+            actions = np.empty((len(obsMatrix), Program.numOutRegs))
+            kernels.runSequence(obsMatrix, self.registers, actions,
+                    self.modes, self.ops, self.dests, self.srcs, fgtStart)
+        else:
+            regs = np.zeros((len(obsMatrix), Program.numOutRegs+
+                    Program.numMemRegs+Program.numFgtRegs))
+            if self.regs is not None:
+                regs[:, :fgtStart] = self.regs[:fgtStart]
+            kernels.runBatch(obsMatrix, regs,
+                    self.modes, self.ops, self.dests, self.srcs)
+            actions = regs[:, :Program.numOutRegs]
+
+        if Program.profiler is not None:
+            Program.profiler.countRuns(len(obsMatrix),
+                    len(obsMatrix)*len(self.code)//7)
+
+        if actionType == 'multi':
+            return actions
+        else:
+            return np.argmax(actions, axis=1)
+
+    """
+    Zeroes all registers in place, or just the fgt registers if not clearAll.
+    Registers not allocated yet are left that way.
+    """
     def clearRegisters(self, clearAll=True):
+        if self.regs is None:
+            return
         if clearAll:
-            self.registers = np.zeros(Program.numOutRegs+Program.numMemRegs+
-                    Program.numFgtRegs)
+            self.regs[:] = 0
         else:
             # reset fgt registers
-            for i in range(Program.numFgtRegs):
-                self.registers[Program.numOutRegs+Program.numMemRegs+i] = 0
+            self.regs[Program.numOutRegs+Program.numMemRegs:] = 0
 
-    def mutate(self, pAdd=-1, pDel=-1, pSwp=-1, pMut=-1):
+    """
+    Mutates the instructions with the given chances (the Program defaults if
+    -1), returning whether anything changed. All random numbers come from rng
+    (Program.rng if None) in one batched draw, the same for list and array
+    genomes, so the two give the same result from the same stream.
+    """
+    def mutate(self, pAdd=-1, pDel=-1, pSwp=-1, pMut=-1, rng=None):
         if pAdd == -1:
             pAdd = Program.pInstAdd
         if pDel == -1:
@@ -100,66 +208,171 @@ class Program:
             pSwp = Program.pInstSwp
         if pMut == -1:
             pMut = Program.pInstMut
+        if rng is None:
+            rng = Program.rng
 
-        changed = False # track if change was made
+        draws, newInsts = Program.drawMutations(len(self.instructions), rng)
+        self.instructions, changed = Program.mutateGenome(self.instructions,
+                draws, newInsts, pAdd, pDel, pSwp, pMut)
+
+        # update data
+        self.extractInstructionsData()
+
+        return changed
+
+    """
+    Random numbers to mutate a genome of numInsts instructions with: draws has
+    one row per operator (delete, swap, mutate, add) and one entry per trial,
+    holding the decision and up to 2 index/bit picks, and newInsts holds the
+    instruction to insert for each add trial.
+    """
+    def drawMutations(numInsts, rng):
+        draws = rng.random((4, numInsts, 3))
+        newInsts = rng.integers(0, 2**sum(Program.instLengths)-1, size=numInsts,
+                dtype=Program.genomeDtype(), endpoint=True)
+        return draws, newInsts
+
+    """
+    Applies drawn mutations to a genome, returning it and whether it changed.
+    List genomes are mutated in place.
+    """
+    def mutateGenome(insts, draws, newInsts, pAdd, pDel, pSwp, pMut):
+        if Program.arrayGenome:
+            return kernels.mutateInstructions(
+                    np.asarray(insts, dtype=Program.genomeDtype()),
+                    draws, newInsts, pDel, pSwp, pMut, pAdd, Program.maxProgSize)
+        changed = Program.mutateList(insts, draws, newInsts,
+                pAdd, pDel, pSwp, pMut)
+        return insts, changed
 
-        oLen = len(self.instructions) # to give all operators equal chances
+    """
+    Applies drawn mutations to a list genome in place, returning whether it
+    changed. Same operators and order as the mutateInstructions kernel for
+    array genomes.
+    """
+    def mutateList(insts, draws, newInsts, pAdd, pDel, pSwp, pMut):
+        changed = False # track if change was made
+        oLen = len(insts) # to give all operators equal chances
+        dels, swps, muts, adds = draws.tolist()
 
         # Deleting
         for i in range(oLen):
             # delete instruction maybe
-            if(len(self.instructions) > 1 and
-                    random.uniform(0,1) < pDel):
-                del self.instructions[random.randint(0, len(self.instructions)-1)]
+            if len(insts) > 1 and dels[i][0] < pDel:
+                del insts[int(dels[i][1]*len(insts))]
 
                 changed = True
 
         # Swapping
         for i in range(oLen):
             # swap instructions maybe
-            if random.uniform(0,1) < pSwp and len(self.instructions) >= 2:
-                idx1 = random.randint(0, len(self.instructions)-1)
-                idx2 = random.randint(0, len(self.instructions)-1)
-                while idx2 == idx1: # make sure different
-                    idx2 = random.randint(0, len(self.instructions)-1)
+            if swps[i][0] < pSwp and len(insts) >= 2:
+                idx1 = int(swps[i][1]*len(insts))
+                idx2 = int(swps[i][2]*(len(insts)-1))
+                if idx2 >= idx1: # make sure different
+                    idx2 += 1
 
-                tmp = self.instructions[idx1]
-                self.instructions[idx1] = self.instructions[idx2]
-                self.instructions[idx2] = tmp
+                tmp = insts[idx1]
+                insts[idx1] = insts[idx2]
+                insts[idx2] = tmp
 
                 changed = True
 
         # Mutating
         for i in range(oLen):
             # mutate instruction maybe
-            if random.uniform(0,1) < pMut:
-                idx = random.randint(0, len(self.instructions)-1)
-                inst = bin(self.instructions[idx]) # get binary rep
-                # flip a random bit
-                bit = random.randint(2, len(inst)-1) # start at 2 for '0b' prefix
-                if inst[bit] == '0':
-                    self.instructions[idx] = int(inst[:bit] + '1' + inst[bit+1:], 2)
-                else:
-                    self.instructions[idx] = int(inst[:bit] + '0' + inst[bit+1:], 2)
+            if muts[i][0] < pMut:
+                idx = int(muts[i][1]*len(insts))
+                # flip a random bit within the instruction's bit length
+                bit = int(muts[i][2]*max(insts[idx].bit_length(), 1))
+                insts[idx] ^= 1 << bit
 
                 changed = True
 
         # Adding
         for i in range(oLen):
             # add random instruction maybe
-            if(len(self.instructions) < Program.maxProgSize and
-                    random.uniform(0,1) < pAdd):
-                self.instructions.insert(
-                    random.randint(0, len(self.instructions)-1),
-                    random.randint(0,2**sum(Program.instLengths)-1))
+            if len(insts) < Program.maxProgSize and adds[i][0] < pAdd:
+                insts.insert(int(adds[i][1]*len(insts)), int(newInsts[i]))
 
                 changed = True
 
-        # update data
-        self.extractInstructionsData()
+        return changed
+
+    """
+    Applies drawn mutations (a (draws, newInsts) pair per genome, see
+    drawMutations) to many genomes with the Program mutation chances. Array
+    genomes are mutated together in one compiled call, list genomes in place.
+    Returns the mutated genomes and whether each changed.
+    """
+    def mutateGenomes(genomes, mutations):
+        if not Program.arrayGenome:
+            changed = [Program.mutateList(genome, draws, newInsts,
+                            Program.pInstAdd, Program.pInstDel,
+                            Program.pInstSwp, Program.pInstMut)
+                        for genome, (draws, newInsts) in zip(genomes, mutations)]
+            return genomes, np.array(changed, dtype=bool)
+
+        dtype = Program.genomeDtype()
+        offsets = np.zeros(len(genomes)+1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(genome) for genome in genomes])
+        out, outOffsets, changed = kernels.mutateGenomes(
+                np.concatenate([np.asarray(genome, dtype=dtype)
+                                for genome in genomes] + [np.zeros(0, dtype)]),
+                offsets,
+                np.concatenate([draws for draws, _ in mutations]
+                                + [np.zeros((4, 0, 3))], axis=1),
+                np.concatenate([newInsts for _, newInsts in mutations]
+                                + [np.zeros(0, dtype)]),
+                Program.pInstDel, Program.pInstSwp, Program.pInstMut,
+                Program.pInstAdd, Program.maxProgSize)
+
+        return ([out[outOffsets[i]:outOffsets[i+1]].copy()
+                    for i in range(len(genomes))], changed)
+
+    """
+    Mutates programs with drawn mutations (see mutateGenomes) and decodes them
+    all in one pass, returning whether each changed. With pool (anything with
+    an ordered map, such as a multiprocessing.Pool or a concurrent.futures
+    executor), the genomes are mutated on it in chunks of chunkSize. The result
+    doesn't depend on the pool or chunks, since the random numbers are already
+    drawn.
+    """
+    def mutatePrograms(programs, mutations, pool=None, chunkSize=100):
+        genomes = [prog.instructions for prog in programs]
+        if pool is None:
+            genomes, changed = Program.mutateGenomes(genomes, mutations)
+        else:
+            config = Program.getConfig()
+            del config['idCount'] # not to be set back in threads
+            results = pool.map(mutateGenomesJob,
+                    [(config, genomes[i:i+chunkSize], mutations[i:i+chunkSize])
+                        for i in range(0, len(genomes), chunkSize)])
+            genomes = [genome for chunk, _ in results for genome in chunk]
+            changed = np.concatenate([chunkChanged for _, chunkChanged in results]
+                                        + [np.zeros(0, dtype=bool)])
+
+        for prog, genome in zip(programs, genomes):
+            prog.instructions = genome
+        Program.decodePrograms(programs)
 
         return changed
 
+    """
+    Mutated copies of the parents, bred in bulk: the copies aren't decoded
+    until mutated, the mutations of child i are drawn from rngs[i], and all of
+    the children are mutated (see mutatePrograms) and decoded at once. Returns
+    the children and whether each changed.
+    """
+    def breedPrograms(parents, rngs, genCreate=0, pool=None, chunkSize=100):
+        children = [Program(program=parent, genCreate=genCreate, decode=False)
+                    for parent in parents]
+        mutations = [Program.drawMutations(len(child.instructions), rng)
+                        for child, rng in zip(children, rngs)]
+        changed = Program.mutatePrograms(children, mutations, pool, chunkSize)
+
+        return children, changed
+
     def reward(self, task, score):
         self.outcomes[task] = score
 
@@ -216,23 +429,124 @@ class Program:
 
         return minMaxs
 
+    """
+    Decodes the instructions into code for execution. Only the effective
+    instructions, those that can reach the output or memory registers, are kept.
+    self.instructions is left as is for mutation.
+    """
     def extractInstructionsData(self): # for efficiency in running
-        instsData = np.array([
-            [
-                Program.getIntSegment(inst, 0, Program.instLengths[0]),
-                Program.getIntSegment(inst, Program.instLengths[0],
-                        Program.instLengths[1]),
-                Program.getIntSegment(inst, sum(Program.instLengths[:2]),
-                        Program.instLengths[2]),
-                Program.getIntSegment(inst, sum(Program.instLengths[:3]),
-                        Program.instLengths[3])
-            ]
-            for inst in self.instructions])
-
-        self.modes = np.array(instsData[:,0], dtype = bool)
-        self.ops = np.array(instsData[:,1], dtype = np.int8)
-        self.dests = np.array(instsData[:,2], dtype = np.int8)
-        self.srcs = np.array(instsData[:,3], dtype = np.int32)
+        if Program.profiler is not None:
+            Program.profiler.count('decodes')
+        modes, ops, dests, srcs = Program.decodeInstructions(self.instructions)
+
+        # only keep effective instructions for execution, introns are skipped
+        effective = kernels.markEffective(modes, ops, dests, srcs,
+                Program.numOutRegs+Program.numMemRegs+Program.numFgtRegs,
+                Program.numOutRegs+Program.numMemRegs)
+
+        self.code = Program.packCode(modes[effective], ops[effective],
+                dests[effective], srcs[effective])
+
+    """
+    extractInstructionsData for many programs at once, decoding all of their
+    instructions in one vectorized pass and packing their effective code.
+    """
+    def decodePrograms(programs):
+        if Program.profiler is not None:
+            Program.profiler.count('decodes', len(programs))
+        genomes, offsets = Program.packGenomes(programs)
+        modes, ops, dests, srcs = Program.decodeInstructions(genomes)
+
+        # only keep effective instructions for execution, introns are skipped
+        effective = kernels.markEffectivePrograms(modes, ops, dests, srcs,
+                offsets, Program.numOutRegs+Program.numMemRegs+Program.numFgtRegs,
+                Program.numOutRegs+Program.numMemRegs)
+        modes, ops = modes[effective], ops[effective]
+        dests, srcs = dests[effective], srcs[effective]
+
+        # effective instructions before each program, and each one's program
+        counts = np.zeros(len(effective)+1, dtype=np.int64)
+        counts[1:] = np.cumsum(effective)
+        starts = counts[offsets]
+        lengths = np.diff(starts)
+        progIdxs = np.repeat(np.arange(len(programs)), lengths)
+
+        # the programs' codes one after another, laid out as in packCode
+        base = 7*starts[progIdxs]
+        local = np.arange(len(modes)) - starts[progIdxs]
+        n = lengths[progIdxs]
+        codes = np.empty(7*len(modes), dtype=np.uint8)
+        codes[(base + 4*local)[:, None] + np.arange(4)] = \
+                srcs.view(np.uint8).reshape(-1, 4)
+        codes[base + 4*n + local] = modes.view(np.uint8)
+        codes[base + 5*n + local] = ops.view(np.uint8)
+        codes[base + 6*n + local] = dests.view(np.uint8)
+
+        for i, prog in enumerate(programs):
+            prog.code = codes[7*starts[i]:7*starts[i+1]].copy()
+
+    """
+    Packs decoded instructions into one byte array, laid out as srcs (int32),
+    modes, ops, dests (1 byte each), srcs first to keep them aligned.
+    """
+    def packCode(modes, ops, dests, srcs):
+        n = len(modes)
+        code = np.empty(7*n, dtype=np.uint8)
+        code[:4*n].view(np.int32)[:] = srcs
+        code[4*n:5*n].view(bool)[:] = modes
+        code[5*n:6*n].view(np.int8)[:] = ops
+        code[6*n:].view(np.int8)[:] = dests
+        return code
+
+    """
+    Class level settings shared by all programs, as a dict. Used to carry the
+    settings over to other processes and files.
+    """
+    def getConfig():
+        return {
+            'maxProgSize': Program.maxProgSize,
+            'numOutRegs': Program.numOutRegs,
+            'numMemRegs': Program.numMemRegs,
+            'numFgtRegs': Program.numFgtRegs,
+            'pInstAdd': Program.pInstAdd,
+            'pInstDel': Program.pInstDel,
+            'pInstSwp': Program.pInstSwp,
+            'pInstMut': Program.pInstMut,
+            'arrayGenome': Program.arrayGenome,
+            'idCount': Program.idCount,
+            'instLengths': list(Program.instLengths)
+        }
+
+    def setConfig(config):
+        for name, value in config.items():
+            setattr(Program, name, value)
+        Program.instLengths = list(Program.instLengths)
+
+    """
+    Sets the class variables found in a pickled state, where the old save
+    functions stored them.
+    """
+    def setStateConfig(state):
+        config = {name: state[name] for name in Program.getConfig()
+                    if name in state}
+        if len(config) > 0:
+            Program.setConfig(config)
+
+    """
+    Hash of the effective instructions. Programs with the same key behave the
+    same, whatever their introns. Register indices are reduced to the register
+    count, input indices are kept as is since the input size isn't known.
+    """
+    def getEffectiveKey(self):
+        regSize = Program.numOutRegs+Program.numMemRegs+Program.numFgtRegs
+        srcs = np.where(self.modes, self.srcs, self.srcs%regSize)
+        code = np.stack([self.modes, self.ops, self.dests%regSize, srcs])
+
+        key = hashlib.blake2b(digest_size=16)
+        key.update(np.array([Program.numOutRegs, Program.numMemRegs,
+                Program.numFgtRegs], dtype=np.int64).tobytes())
+        key.update(code.astype(np.int64).tobytes())
+        return key.digest()
 
     def setInstructionBitLengths(lMode=-1, lOp=-1, lDest=-1, lSrc=-1):
         if lMode == -1:
@@ -249,49 +563,92 @@ class Program:
         Program.instLengths[2] = lDest
         Program.instLengths[3] = lSrc
 
+    """
+    Smallest unsigned integer type that fits an instruction, for array genomes.
+    """
+    def genomeDtype():
+        if sum(Program.instLengths) <= 32:
+            return np.uint32
+        else:
+            return np.uint64
+
+    """
+    Copy of instructions in the genome representation currently in use.
+    """
+    def copyInstructions(instructions):
+        if Program.arrayGenome:
+            return np.array(instructions, dtype=Program.genomeDtype())
+        else:
+            return [int(inst) for inst in instructions]
+
+    """
+    The instructions as a compact array, whichever genome representation is in
+    use. Not a copy for array genomes.
+    """
+    def getGenome(self):
+        return np.asarray(self.instructions, dtype=Program.genomeDtype())
+
+    """
+    Concatenated genomes of the programs, and offsets where program i's genome
+    is offsets[i] up to offsets[i+1].
+    """
+    def packGenomes(programs):
+        genomes = [prog.getGenome() for prog in programs]
+        offsets = np.zeros(len(genomes)+1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(genome) for genome in genomes])
+        return np.concatenate(
+                genomes + [np.zeros(0, dtype=Program.genomeDtype())]), offsets
+
+    """
+    Gets the value of bits bitStart up to bitStart+bitLen of an instruction,
+    counting from the most significant bit.
+    """
     def getIntSegment(num, bitStart, bitLen):
-        binStr = format(num, 'b').zfill(sum(Program.instLengths))
-        return int(binStr[bitStart:bitStart+bitLen], 2)
-
-    @njit
-    def run(inpt, regs, modes, ops, dsts, srcs):
-        regSize = len(regs)
-        inptLen = len(inpt)
-        for i in range(len(modes)):
-            # first get source
-            if modes[i] == False:
-                src = regs[srcs[i]%regSize]
-            else:
-                src = inpt[srcs[i]%inptLen]
-
-            # do operation
-            op = ops[i]
-            x = regs[dsts[i]]
-            y = src
-            dest = dsts[i]%regSize
-            if op == 0:
-                regs[dest] = x+y
-            elif op == 1:
-                regs[dest] = x-y
-            elif op == 2:
-                regs[dest] = x*y
-            elif op == 3:
-                if y != 0:
-                    regs[dest] = x/y
-            elif op == 4:
-                regs[dest] = math.cos(y)
-            elif op == 5:
-                if y > 0:
-                    regs[dest] = math.log(y)
-            elif op == 6:
-                regs[dest] = math.exp(y)
-            elif op == 7:
-                if x < y:
-                    regs[dest] = x*(-1)
-
-            if math.isnan(regs[dest]):
-                regs[dest] = 0
-            elif regs[dest] == np.inf:
-                regs[dest] = np.finfo(np.float64).max
-            elif regs[dest] == np.NINF:
-                regs[dest] = np.finfo(np.float64).min
+        shift = sum(Program.instLengths) - bitStart - bitLen
+        return (num >> shift) & ((1 << bitLen) - 1)
+
+    """
+    Decodes a list/array of instructions into mode, op, dest and src arrays all
+    at once, with shifts and masks from the bit lengths in instLengths.
+    """
+    def decodeInstructions(instructions):
+        insts = np.asarray(instructions, dtype=np.int64)
+
+        fields = []
+        shift = sum(Program.instLengths)
+        for length in Program.instLengths:
+            shift -= length
+            fields.append((insts >> shift) & ((1 << length) - 1))
+
+        return (fields[0].astype(bool), fields[1].astype(np.int8),
+                fields[2].astype(np.int8), fields[3].astype(np.int32))
+
+    """
+    Pickled state is the slots, old pickles of unslotted programs (a __dict__
+    with decoded arrays) are read too.
+    """
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in Program.__slots__
+                    if hasattr(self, name)}
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple): # (dict, slots) state
+            state = dict(state[0] or {}, **(state[1] or {}))
+        Program.setStateConfig(state)
+        self.regs = state.get('registers')
+        self.fitness = None
+        self.refs = 0
+        for name, value in state.items():
+            if name in Program.__slots__:
+                setattr(self, name, value)
+        if 'code' not in state:
+            self.extractInstructionsData()
+
+"""
+Pool job of Program.mutatePrograms, mutating a chunk of genomes with the
+Program settings of the caller.
+"""
+def mutateGenomesJob(job):
+    config, genomes, mutations = job
+    Program.setConfig(config)
+    return Program.mutateGenomes(genomes, mutations)
@@ -0,0 +1,53 @@
+"""
+Set of programs indexed by id, used as TeamTrainer's pool of live programs.
+Adding, removing, membership and indexing are all constant time, removal
+moving the last program into the freed place. Programs are dropped from the
+pool once no team refers to them (their refs count reaches 0).
+"""
+class ProgramPool:
+
+    def __init__(self, programs=[]):
+        self.programs = []
+        self.indices = {} # program id -> index in programs
+        for prog in programs:
+            self.add(prog)
+
+    """
+    Adds the program, returns whether it wasn't in the pool already.
+    """
+    def add(self, prog):
+        if prog.id in self.indices:
+            return False
+        self.indices[prog.id] = len(self.programs)
+        self.programs.append(prog)
+        return True
+
+    def remove(self, prog):
+        idx = self.indices.pop(prog.id)
+        last = self.programs.pop()
+        if last is not prog: # fill the gap with the last program
+            self.programs[idx] = last
+            self.indices[last.id] = idx
+
+    """
+    Drops a reference to the program, removing it once unreferenced. Returns
+    whether it was removed.
+    """
+    def release(self, prog):
+        prog.refs -= 1
+        if prog.refs == 0 and prog.id in self.indices:
+            self.remove(prog)
+            return True
+        return False
+
+    def __contains__(self, prog):
+        return prog.id in self.indices
+
+    def __len__(self):
+        return len(self.programs)
+
+    def __iter__(self):
+        return iter(self.programs)
+
+    def __getitem__(self, idx):
+        return self.programs[idx]
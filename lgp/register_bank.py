@@ -0,0 +1,90 @@
+import numpy as np
+from lgp.program import Program
+
+"""
+Registers of a whole population in one contiguous (rows, numRegs) array, owned
+by a trainer. Each program's registers are a view of its row, so resetting the
+registers of every program is one slice assignment. Rows of removed programs go
+on a free list to be reused by new programs, rows are never moved to compact
+the array.
+"""
+class RegisterBank:
+
+    def __init__(self, capacity=64):
+        self.registers = np.zeros((0, Program.numOutRegs+Program.numMemRegs+
+                Program.numFgtRegs))
+        self.owners = [] # program of each row, None if free
+        self.rows = {} # program id -> row
+        self.freeRows = []
+        self.grow(capacity)
+
+    """
+    Gives the program a row, and its registers as a view of it. The program's
+    current register values are kept.
+    """
+    def acquire(self, prog):
+        if prog.id in self.rows:
+            return self.rows[prog.id]
+
+        if len(self.freeRows) == 0:
+            self.grow(2*len(self.owners))
+        row = self.freeRows.pop()
+
+        if prog.regs is None:
+            self.registers[row] = 0
+        else:
+            self.registers[row] = prog.regs
+        prog.regs = self.registers[row]
+        self.owners[row] = prog
+        self.rows[prog.id] = row
+
+        return row
+
+    """
+    Frees the program's row, the program keeps a copy of its registers.
+    """
+    def release(self, prog):
+        row = self.rows.pop(prog.id)
+        prog.regs = self.registers[row].copy()
+        self.owners[row] = None
+        self.freeRows.append(row)
+
+    def grow(self, capacity):
+        oldCap = len(self.owners)
+        capacity = max(capacity, 1)
+        registers = np.zeros((capacity, self.registers.shape[1]))
+        registers[:oldCap] = self.registers
+        self.registers = registers
+        self.owners.extend([None]*(capacity-oldCap))
+        # hand out lower rows first
+        self.freeRows.extend(range(capacity-1, oldCap-1, -1))
+        self.rebind()
+
+    """
+    Points the registers of every owning program back to its row, after the
+    array is reallocated or unpickled.
+    """
+    def rebind(self):
+        for row, prog in enumerate(self.owners):
+            if prog is not None:
+                prog.regs = self.registers[row]
+
+    """
+    Rows of the programs, in order.
+    """
+    def getRows(self, programs):
+        return np.array([self.rows[prog.id] for prog in programs], dtype=np.int64)
+
+    """
+    Zeroes the registers of every program, or only the fgt registers if not
+    clearAll.
+    """
+    def clear(self, clearAll=True):
+        if clearAll:
+            self.registers[:] = 0
+        else:
+            self.registers[:, Program.numOutRegs+Program.numMemRegs:] = 0
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.rebind()
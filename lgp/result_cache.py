@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+"""
+Cache of agent scores keyed by the agent's effective code (see
+Program.getEffectiveKey), so that agents behaving the same as one already
+evaluated, like children whose mutations only hit introns, get its scores
+instead of being evaluated again. Only valid for deterministic tasks, tasks
+lists the tasks that may be cached (all if None). Least recently used entries
+are evicted past maxSize.
+"""
+class ResultCache:
+
+    def __init__(self, maxSize=10000, tasks=None):
+        self.maxSize = maxSize
+        self.tasks = tasks
+        self.entries = OrderedDict() # key -> {task: score}
+        self.hits = 0
+        self.misses = 0
+
+    def isCacheable(self, task):
+        return self.tasks is None or task in self.tasks
+
+    """
+    Stores the cacheable scores of outcomes under key.
+    """
+    def store(self, key, outcomes):
+        scores = {task: score for task, score in outcomes.items()
+                    if self.isCacheable(task)}
+        if len(scores) == 0:
+            return
+
+        entry = self.entries.setdefault(key, {})
+        entry.update(scores)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    """
+    Cached scores of key as a new dict, or None if not cached.
+    """
+    def lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return dict(entry)
+
+    def getStats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': self.hits/lookups if lookups > 0 else 0,
+            'size': len(self.entries)
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,114 @@
+import random
+import numpy as np
+from lgp.team_trainer import TeamTrainer
+from lgp.executor import PopulationExecutor, TeamExecutor
+
+"""
+Runs the agents of a Trainer or TeamTrainer through episodes of local
+environments in lockstep, one environment per agent. Each step computes the
+actions of every agent in one compiled call, and the rewards go straight into
+the trainer's score table:
+
+    envs = [ToyEnv(seed=i) for i in range(trainer.popSize)]
+    rollout(trainer, envs, 'someTask')
+    trainer.evolve('someTask')
+
+Environments are any objects with reset() returning an observation and
+step(action) returning (obs, reward, done, ...), gym style (newer gym's
+(obs, info) resets and terminated/truncated steps work too). Agents whose
+episodes end early are masked out until the slowest one is done. With fewer
+environments than agents, the agents run in batches of len(envs).
+"""
+
+"""
+Runs an episode for every agent of the trainer that doesn't have a score for
+all of skipTasks, and scores each with its total reward on task. actionType is
+as in Program.getAction, for programs. Returns the agents and their totals.
+"""
+def rollout(trainer, envs, task, maxSteps=1000, actionType='multi',
+        skipTasks=[]):
+    agents = [agent for agent in trainer.getAgents()
+                if len(skipTasks) == 0
+                    or any(task not in agent.outcomes for task in skipTasks)]
+
+    totals = np.zeros(len(agents))
+    for start in range(0, len(agents), len(envs)):
+        batch = agents[start:start+len(envs)]
+        totals[start:start+len(batch)] = runEpisodes(trainer, batch,
+                envs[:len(batch)], maxSteps, actionType)
+
+    trainer.applyScoreArrays(np.array([agent.id for agent in agents]), task,
+            totals.reshape(1, -1))
+
+    return agents, totals
+
+"""
+One lockstep episode of each agent in its environment, returning the total
+rewards.
+"""
+def runEpisodes(trainer, agents, envs, maxSteps, actionType):
+    if isinstance(trainer, TeamTrainer):
+        executor = TeamExecutor(agents, trainer.registerBank)
+    else:
+        executor = PopulationExecutor(agents, trainer.registerBank)
+    executor.clearRegisters()
+
+    obs = np.array([resetEnv(env) for env in envs], dtype=np.float64)
+    totals = np.zeros(len(agents))
+    active = np.ones(len(agents), dtype=bool)
+    for _ in range(maxSteps):
+        if isinstance(trainer, TeamTrainer):
+            actions = executor.getActions(obs)
+        else:
+            actions = executor.getActions(obs, actionType)
+
+        for i in np.flatnonzero(active):
+            result = envs[i].step(actions[i])
+            obs[i] = result[0]
+            totals[i] += result[1]
+            # gym's (obs, reward, terminated, truncated, info)
+            if result[2] or (len(result) == 5 and result[3]):
+                active[i] = False
+
+        if not active.any():
+            break
+
+    return totals
+
+def resetEnv(env):
+    obs = env.reset()
+    if isinstance(obs, tuple): # gym's (obs, info)
+        obs = obs[0]
+    return obs
+
+"""
+Pure Python environment for testing without gym. The agent moves a point
+on a line towards a target: obs is [position, target], the action is a move
+(the first output clipped to [-0.1, 0.1], or for a discrete action 0, 1, 2 for
+left, stay, right), and the reward is minus the distance left. The episode ends
+once the target is reached or after maxSteps steps.
+"""
+class ToyEnv:
+
+    def __init__(self, seed=0, maxSteps=100):
+        self.rng = random.Random(seed)
+        self.maxSteps = maxSteps
+
+    def reset(self):
+        self.position = self.rng.uniform(-1, 1)
+        self.target = self.rng.uniform(-1, 1)
+        self.steps = 0
+        return [self.position, self.target]
+
+    def step(self, action):
+        if np.ndim(action) == 0:
+            move = (int(action) % 3 - 1)*0.1
+        else:
+            move = min(max(float(action[0]), -0.1), 0.1)
+
+        self.position += move
+        self.steps += 1
+        distance = abs(self.position - self.target)
+        done = distance < 0.05 or self.steps >= self.maxSteps
+
+        return [self.position, self.target], -distance, done, {}
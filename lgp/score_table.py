@@ -0,0 +1,228 @@
+from collections.abc import MutableMapping
+import warnings
+import numpy as np
+
+"""
+Columnar store of agent scores, owned by a trainer. Scores are kept in a
+(tasks, agents) float array with a mask of which scores are present, and agents
+are found by id. Normalization, min/max, aggregation and ranking over many
+agents are then array operations. Agents keep an outcomes dict API through
+OutcomesView.
+"""
+class ScoreTable:
+
+    def __init__(self, capacity=64):
+        self.tasks = [] # task of each row
+        self.taskRows = {} # task -> row
+        self.slots = {} # agent id -> column
+        self.freeSlots = [] # columns of removed agents, to be reused
+        self.values = np.zeros((0, capacity))
+        self.present = np.zeros((0, capacity), dtype=bool)
+
+    """
+    Adds an agent to the table, with any scores it already has, and returns a
+    view of its scores to be used as the agent's outcomes.
+    """
+    def addAgent(self, agentId, outcomes=None):
+        if agentId not in self.slots:
+            if len(self.freeSlots) == 0:
+                self.grow()
+            self.slots[agentId] = self.freeSlots.pop()
+
+        if outcomes is not None:
+            for task, score in outcomes.items():
+                self.setScore(agentId, task, score)
+
+        return OutcomesView(self, agentId)
+
+    """
+    Removes an agent and frees its column. Returns its scores as a plain dict.
+    """
+    def removeAgent(self, agentId):
+        outcomes = dict(OutcomesView(self, agentId))
+        slot = self.slots.pop(agentId)
+        self.present[:, slot] = False
+        self.freeSlots.append(slot)
+        return outcomes
+
+    def grow(self):
+        oldCap = self.values.shape[1]
+        newCap = max(2*oldCap, 1)
+        values = np.zeros((len(self.tasks), newCap))
+        present = np.zeros((len(self.tasks), newCap), dtype=bool)
+        values[:, :oldCap] = self.values
+        present[:, :oldCap] = self.present
+        self.values = values
+        self.present = present
+        # hand out lower columns first
+        self.freeSlots.extend(range(newCap-1, oldCap-1, -1))
+
+    def getTaskRow(self, task, create=False):
+        row = self.taskRows.get(task)
+        if row is None and create:
+            row = len(self.tasks)
+            self.tasks.append(task)
+            self.taskRows[task] = row
+            self.values = np.vstack([self.values,
+                    np.zeros((1, self.values.shape[1]))])
+            self.present = np.vstack([self.present,
+                    np.zeros((1, self.present.shape[1]), dtype=bool)])
+
+        return row
+
+    def setScore(self, agentId, task, score):
+        row = self.getTaskRow(task, create=True)
+        slot = self.slots[agentId]
+        self.values[row, slot] = score
+        self.present[row, slot] = True
+
+    """
+    Sets the scores of many agents at once. scores is a (len(tasks), len(ids))
+    matrix with a row of scores for each task. Ids not in the table are
+    ignored.
+    """
+    def setScores(self, ids, tasks, scores):
+        if isinstance(tasks, str):
+            tasks = [tasks]
+        ids = np.asarray(ids).tolist()
+        scores = np.asarray(scores, dtype=np.float64).reshape(len(tasks), len(ids))
+
+        known = np.array([agentId in self.slots for agentId in ids], dtype=bool)
+        slots = np.array([self.slots[agentId]
+                    for agentId, isKnown in zip(ids, known) if isKnown],
+                dtype=np.int64)
+        rows = np.array([self.getTaskRow(task, create=True) for task in tasks],
+                dtype=np.int64)
+
+        self.values[rows[:, None], slots] = scores[:, known]
+        self.present[rows[:, None], slots] = True
+
+    def hasScore(self, agentId, task):
+        row = self.taskRows.get(task)
+        return row is not None and bool(self.present[row, self.slots[agentId]])
+
+    def getScore(self, agentId, task):
+        if not self.hasScore(agentId, task):
+            raise KeyError(task)
+        return float(self.values[self.taskRows[task], self.slots[agentId]])
+
+    def deleteScore(self, agentId, task):
+        if not self.hasScore(agentId, task):
+            raise KeyError(task)
+        self.present[self.taskRows[task], self.slots[agentId]] = False
+
+    def getTasks(self, agentId):
+        slot = self.slots[agentId]
+        return [task for row, task in enumerate(self.tasks)
+                    if self.present[row, slot]]
+
+    """
+    (len(tasks), len(ids)) scores of the agents on the tasks, with nan where
+    scores are missing.
+    """
+    def getMatrix(self, ids, tasks):
+        if isinstance(tasks, str):
+            tasks = [tasks]
+        slots = np.array([self.slots[agentId] for agentId in ids], dtype=np.int64)
+        matrix = np.full((len(tasks), len(slots)), np.nan)
+        for i, task in enumerate(tasks):
+            row = self.taskRows.get(task)
+            if row is not None:
+                present = self.present[row, slots]
+                matrix[i, present] = self.values[row, slots[present]]
+
+        return matrix
+
+    """
+    [min, max] of each task among the agents, like Program.getOverallMinMaxs.
+    """
+    def getMinMaxs(self, ids, tasks):
+        matrix = self.getMatrix(ids, tasks)
+        with warnings.catch_warnings(): # tasks no agent has are nan
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.stack([np.nanmin(matrix, axis=1),
+                             np.nanmax(matrix, axis=1)], axis=1)
+
+    """
+    (len(tasks), len(ids)) scores normalized to [0,1] per task among the agents,
+    0 for tasks with no spread, like Program.getScore.
+    """
+    def getNormalized(self, ids, tasks):
+        matrix = self.getMatrix(ids, tasks)
+        minMaxs = self.getMinMaxs(ids, tasks)
+        spans = minMaxs[:, 1] - minMaxs[:, 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            normed = (matrix - minMaxs[:, :1])/spans[:, None]
+        normed[spans == 0] = 0
+        normed[np.isnan(matrix)] = np.nan
+
+        return normed
+
+    """
+    Score of each agent combined over the tasks. Types: 'min', 'max', 'avg',
+    'sum'. A single task gives the raw scores, otherwise they are normalized
+    first if norm. Agents missing a score get nan.
+    """
+    def aggregate(self, ids, tasks, sType='min', norm=True):
+        if isinstance(tasks, str):
+            tasks = [tasks]
+        if len(tasks) == 1:
+            return self.getMatrix(ids, tasks)[0]
+
+        if norm:
+            matrix = self.getNormalized(ids, tasks)
+        else:
+            matrix = self.getMatrix(ids, tasks)
+
+        if sType == 'min':
+            return np.min(matrix, axis=0)
+        elif sType == 'max':
+            return np.max(matrix, axis=0)
+        elif sType == 'avg':
+            return np.mean(matrix, axis=0)
+        elif sType == 'sum':
+            return np.sum(matrix, axis=0)
+
+    """
+    Indices into ids from best to worst aggregate score (worst to best if not
+    reverse). Agents missing a score come last. Ties keep their order.
+    """
+    def rank(self, ids, tasks, sType='min', norm=True, reverse=True):
+        scores = self.aggregate(ids, tasks, sType, norm)
+        if reverse:
+            scores = -scores
+        return np.argsort(scores, kind='stable')
+
+"""
+Dict-like view of one agent's scores in a ScoreTable, used as the agent's
+outcomes. Pickles as a plain dict.
+"""
+class OutcomesView(MutableMapping):
+
+    def __init__(self, table, agentId):
+        self.table = table
+        self.agentId = agentId
+
+    def __getitem__(self, task):
+        return self.table.getScore(self.agentId, task)
+
+    def __setitem__(self, task, score):
+        self.table.setScore(self.agentId, task, score)
+
+    def __delitem__(self, task):
+        self.table.deleteScore(self.agentId, task)
+
+    def __contains__(self, task):
+        return self.table.hasScore(self.agentId, task)
+
+    def __iter__(self):
+        return iter(self.table.getTasks(self.agentId))
+
+    def __len__(self):
+        return len(self.table.getTasks(self.agentId))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
@@ -0,0 +1,100 @@
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+from lgp.program import Program
+
+"""
+Shared memory store of a population's genomes, so that evaluation workers can
+read programs by id without them being pickled to every worker. The trainer
+side publishes the packed genomes once per generation into a new shared memory
+block, and workers attach to it by name and read genomes zero-copy.
+
+Block layout, all int64 except the genomes:
+    numPrograms, numInstructions, genome itemsize
+    ids (sorted), offsets (numPrograms+1), genomes
+"""
+class SharedPopulationStore:
+
+    def __init__(self):
+        self.shm = None
+        # worker processes started from now on share this process's resource
+        # tracker, instead of starting their own that would unlink the blocks
+        # they attach to when they exit
+        resource_tracker.ensure_running()
+
+    """
+    Writes the genomes of programs into a new block, releasing the previous
+    one, and returns the block's name for readers.
+    """
+    def publish(self, programs):
+        programs = sorted(programs, key=lambda prog: prog.id)
+        genomes, offsets = Program.packGenomes(programs)
+        ids = np.array([prog.id for prog in programs], dtype=np.int64)
+
+        meta = np.array([len(ids), len(genomes), genomes.itemsize], dtype=np.int64)
+        size = meta.nbytes + ids.nbytes + offsets.nbytes + genomes.nbytes
+
+        self.close()
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        pos = 0
+        for arr in [meta, ids, offsets, genomes]:
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=self.shm.buf,
+                    offset=pos)[:] = arr
+            pos += arr.nbytes
+
+        return self.shm.name
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+"""
+Worker side read only access to a published block.
+"""
+class SharedPopulationReader:
+
+    def __init__(self, name):
+        self.name = name
+        self.shm = attachSharedMemory(name)
+
+        numPrograms, numInsts, itemSize = np.ndarray(3, dtype=np.int64,
+                buffer=self.shm.buf)
+        pos = 3*8
+        self.ids = np.ndarray(numPrograms, dtype=np.int64,
+                buffer=self.shm.buf, offset=pos)
+        pos += self.ids.nbytes
+        self.offsets = np.ndarray(numPrograms+1, dtype=np.int64,
+                buffer=self.shm.buf, offset=pos)
+        pos += self.offsets.nbytes
+        self.genomes = np.ndarray(numInsts,
+                dtype=np.uint32 if itemSize == 4 else np.uint64,
+                buffer=self.shm.buf, offset=pos)
+
+    """
+    View of a program's genome in shared memory, found by binary search on
+    the sorted ids.
+    """
+    def getGenome(self, progId):
+        i = np.searchsorted(self.ids, progId)
+        if i == len(self.ids) or self.ids[i] != progId:
+            raise KeyError(progId)
+        return self.genomes[self.offsets[i]:self.offsets[i+1]]
+
+    def close(self):
+        # views into the buffer must go before closing it
+        self.ids = self.offsets = self.genomes = None
+        self.shm.close()
+
+"""
+Attaches to an existing block without the resource tracker taking ownership
+of it, the publishing side unlinks it.
+"""
+def attachSharedMemory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # no track argument before python 3.13, pool workers share the
+        # publisher's resource tracker (see SharedPopulationStore) so
+        # registering again is harmless
+        return shared_memory.SharedMemory(name=name)
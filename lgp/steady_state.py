@@ -0,0 +1,107 @@
+from collections import deque
+
+"""
+Steady state (asynchronous) evolution on a Trainer or TeamTrainer. Instead of
+scoring a whole generation before select and generate, agents are handed out
+one at a time with ask, and each score sent back with tell lets a new agent be
+bred right away: a tournament over the scored agents picks a parent, and
+another picks a loser that the child replaces. Evaluation is then never held
+up waiting on the slowest agent of a generation.
+
+    evolver = SteadyStateEvolver(trainer, 'task')
+    agent = evolver.ask() # None if everything is out being evaluated
+    ...
+    evolver.tell(agent.id, {'task': score})
+
+ask and tell never block, so they can be called from an asyncio loop or as
+results come back from workers (see ParallelEvaluator.evolveSteadyState).
+The trainer's curGen moves on every popSize scores.
+"""
+class SteadyStateEvolver:
+
+    def __init__(self, trainer, tasks, fitType='min', tournamentSize=4,
+            norm=True):
+        if isinstance(tasks, str):
+            tasks = [tasks]
+        self.trainer = trainer
+        self.tasks = tasks
+        self.fitType = fitType
+        self.tournamentSize = tournamentSize
+        self.norm = norm
+
+        self.pending = deque(agent for agent in trainer.getAgents()
+                                if not self.isScored(agent))
+        self.inFlight = {} # agent id -> agent, handed out but not scored
+        self.numTold = 0
+
+    def isScored(self, agent):
+        return all(task in agent.outcomes for task in self.tasks)
+
+    """
+    Next agent to evaluate. Agents not scored yet go first, after that a new
+    agent is bred. None if there are too few scored agents to breed from, or
+    if the popSize children bred all got cached scores, ask again then.
+    """
+    def ask(self):
+        while len(self.pending) > 0:
+            agent = self.pending.popleft()
+            if not self.isScored(agent):
+                self.inFlight[agent.id] = agent
+                return agent
+
+        # a child with cached scores counts as scored, breed again
+        for _ in range(self.trainer.popSize):
+            child = self.breed()
+            if child is None:
+                return None
+            if not self.isScored(child):
+                self.inFlight[child.id] = child
+                return child
+            self.countScore()
+
+        return None
+
+    """
+    Scores of an agent handed out by ask. outcomes maps tasks to scores.
+    """
+    def tell(self, agentId, outcomes):
+        agent = self.inFlight.pop(agentId)
+        agent.outcomes.update(outcomes)
+        self.countScore()
+
+    """
+    Counts a scored agent, moving the trainer's curGen on every popSize scores.
+    """
+    def countScore(self):
+        self.numTold += 1
+        if self.numTold % self.trainer.popSize == 0:
+            self.trainer.curGen += 1
+
+    """
+    Replaces the loser of a tournament with a mutated copy of the winner of
+    another. Only scored agents that aren't out being evaluated take part.
+    """
+    def breed(self):
+        scored = [agent for agent in self.trainer.getAgents()
+                    if agent.id not in self.inFlight and self.isScored(agent)]
+        if len(scored) < 2:
+            return None
+
+        parent = self.tournament(scored)[0]
+        loser = self.tournament([agent for agent in scored
+                                    if agent is not parent])[-1]
+        self.trainer.removeAgent(loser)
+        return self.trainer.breed(parent)
+
+    """
+    Random sample of tournamentSize agents, best to worst, drawn from the
+    trainer's random stream.
+    """
+    def tournament(self, agents):
+        idxs = self.trainer.rng.choice(len(agents),
+                min(self.tournamentSize, len(agents)), replace=False)
+        contestants = [agents[i] for i in idxs]
+        order = self.trainer.scoreTable.rank(
+                [agent.id for agent in contestants], self.tasks,
+                self.fitType, self.norm)
+        return [contestants[i] for i in order]
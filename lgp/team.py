@@ -1,4 +1,3 @@
-import random
 from lgp.program import Program
 
 """
@@ -9,7 +8,10 @@ class Team:
 
     idCount = 0
 
-    def __init__(self, team=None, teamSize=1, genCreate=0):
+    def __init__(self, team=None, teamSize=1, genCreate=0, programs=None,
+            rng=None):
+        if rng is None:
+            rng = Program.rng
         self.programs = []
         self.genCreate = genCreate
         self.outcomes = {} # stores rewards for tasks
@@ -20,35 +22,57 @@ class Team:
         if team is not None: # clone team
             for prog in team.programs:
                 self.programs.append(prog)
+        elif programs is not None: # team of existing programs
+            self.programs = list(programs)
         else: # create new team (generate programs)
-            self.programs = [Program(progSize=random.randint(1,Program.maxProgSize),
-                                     genCreate=genCreate)
-                                for _ in range(teamSize)]
+            for _ in range(teamSize):
+                progSize = int(rng.integers(1, Program.maxProgSize, endpoint=True))
+                self.programs.append(Program(progSize=progSize,
+                        genCreate=genCreate, rng=rng))
 
-        # track references, +1 for clone, =1 for new
+        # track references
         for prog in self.programs:
-            try:
-                prog.refs += 1
-            except:
-                prog.refs = 1
+            prog.refs += 1
 
     """
-    Gets the action from each program in team (0th register).
+    Gets the action from each program in team (0th register). TeamExecutor does
+    the same for many teams in one compiled call.
     """
     def getAction(self, obs):
         return [prog.getAction(obs)[0] for prog in self.programs]
 
+    """
+    Key of the team's behaviour, from the effective code of its programs in
+    order (see Program.getEffectiveKey).
+    """
+    def getEffectiveKey(self):
+        return tuple(prog.getEffectiveKey() for prog in self.programs)
+
+    """
+    Mutates the team, drawing replacements from allPrograms (a list or
+    ProgramPool). All random numbers come from rng, Program.rng if None. Given
+    a deferred dict, the programs copied to be mutated are only given their
+    drawn mutations, as deferred[id] = (program, (draws, newInsts)), to be
+    mutated in bulk with the Program mutation chances later (see
+    Program.mutatePrograms). Returns how many programs had their genome changed
+    by mutating them here, deferred ones aren't counted.
+    """
     def mutate(self, pDel, pSwp, pMut, allPrograms, gen,
-                    pAddInst, pDelInst, pSwpInst, pMutInst):
+                    pAddInst, pDelInst, pSwpInst, pMutInst, rng=None,
+                    deferred=None):
+        if rng is None:
+            rng = Program.rng
 
+        numMutated = 0 # programs whose genome mutation changed
         changed = False
         while not changed:
             # first delete any programs
             p = pDel
             redo = False
-            while random.uniform(0,1) < pDel or redo:
+            while ((rng.random() < pDel or redo)
+                    and any(prog is not None for prog in self.programs)):
                 p *= pDel
-                idx = random.randint(0,len(self.programs)-1)
+                idx = int(rng.random()*len(self.programs))
                 try:
                     redo = False
                     self.programs[idx].refs -= 1
@@ -61,14 +85,18 @@ class Team:
             # then add in to fill up deleted
             for i in range(len(self.programs)):
                 if self.programs[i] is None:
-                    self.programs[i] = random.choice(allPrograms)
+                    self.programs[i] = allPrograms[
+                            int(rng.random()*len(allPrograms))]
                     self.programs[i].refs += 1
 
             # then swap any
             p = pSwp
-            while random.uniform(0,1) < pSwp:
+            while rng.random() < pSwp and len(self.programs) >= 2:
                 p *= pSwp
-                idx1, idx2 = random.sample(range(len(self.programs)), 2)
+                idx1 = int(rng.random()*len(self.programs))
+                idx2 = int(rng.random()*(len(self.programs)-1))
+                if idx2 >= idx1: # make sure different
+                    idx2 += 1
                 tmp = self.programs[idx1]
                 self.programs[idx1] = self.programs[idx2]
                 self.programs[idx2] = tmp
@@ -76,15 +104,31 @@ class Team:
 
             # then mutate any
             p = pMut
-            while random.uniform(0,1) < pMut:
+            while rng.random() < pMut:
                 p *= pMut
-                idx = random.randint(0,len(self.programs)-1)
-                self.programs[idx].refs -= 1
-                self.programs[idx] = Program(program=self.programs[idx], genCreate=gen)
-                self.programs[idx].mutate(pAddInst, pDelInst, pSwpInst, pMutInst)
+                idx = int(rng.random()*len(self.programs))
+                prog = self.programs[idx]
+                prog.refs -= 1
+                if deferred is not None and prog.id in deferred:
+                    # a copy made above, copy it as it would be mutated
+                    draws, newInsts = deferred.pop(prog.id)[1]
+                    prog.instructions, progChanged = Program.mutateGenome(
+                            prog.instructions, draws, newInsts, Program.pInstAdd,
+                            Program.pInstDel, Program.pInstSwp, Program.pInstMut)
+                    numMutated += int(progChanged)
+
+                newProg = Program(program=prog, genCreate=gen, decode=False)
+                if deferred is None:
+                    numMutated += int(newProg.mutate(pAddInst, pDelInst,
+                            pSwpInst, pMutInst, rng))
+                else:
+                    deferred[newProg.id] = (newProg, Program.drawMutations(
+                            len(newProg.instructions), rng))
+                self.programs[idx] = newProg
                 self.programs[idx].refs = 1
                 changed = True
 
+        return numMutated
 
     def reward(self, task, score):
         self.outcomes[task] = score
@@ -1,6 +1,11 @@
-import random
+import numpy as np
 from lgp.program import Program
 from lgp.team import Team
+from lgp.score_table import ScoreTable
+from lgp.result_cache import ResultCache
+from lgp.register_bank import RegisterBank
+from lgp.profiler import phase
+from lgp.program_pool import ProgramPool
 
 """
 Creates and maintains a population of programs.
@@ -10,7 +15,9 @@ class TeamTrainer:
     def __init__(self, numActions, popSize=200, gap=0.5, maxProgSize=128,
             numOutRegs=8, numMemRegs=0, numFgtRegs=0,
             pProgDel=0.7, pProgSwp=0.6, pProgMut=0.65,
-            pInstAdd=0.08, pInstDel=0.06, pInstSwp=0.05, pInstMut=0.05):
+            pInstAdd=0.08, pInstDel=0.06, pInstSwp=0.05, pInstMut=0.05,
+            arrayGenome=False, cacheSize=0, cacheTasks=None, profiler=None,
+            seed=None):
 
         self.numActions = numActions
 
@@ -25,6 +32,12 @@ class TeamTrainer:
         Program.pInstDel = pInstDel
         Program.pInstSwp = pInstSwp
         Program.pInstMut = pInstMut
+        Program.arrayGenome = arrayGenome
+
+        # per generation instrumentation, off if None
+        self.profiler = profiler
+        Program.profiler = profiler
+        self.profileStats = {}
 
         self.pProgDel=pProgDel
         self.pProgSwp = pProgSwp
@@ -32,20 +45,72 @@ class TeamTrainer:
 
         self.curGen = 0
 
+        # the trainer's random stream, and independent child streams spawned
+        # from the seed sequence for breeding (see spawnRngs)
+        self.seedSequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seedSequence)
+
+        self.scoreTable = ScoreTable(capacity=popSize)
+        # registers of all programs
+        self.registerBank = RegisterBank(capacity=popSize*numActions)
+
+        # scores of evaluated teams by their programs' effective code, for
+        # deterministic tasks (cacheTasks, or all tasks if None)
+        self.resultCache = None
+        if cacheSize > 0:
+            self.resultCache = ResultCache(cacheSize, cacheTasks)
+
         self.initPop()
 
         self.scoreStats = {}
 
     def initPop(self):
         # create teams (each creating its programs)
-        self.teams = [Team(teamSize=self.numActions, genCreate=self.curGen)
+        self.teams = [Team(teamSize=self.numActions, genCreate=self.curGen,
+                           rng=self.rng)
                         for _ in range(self.popSize)]
 
+        # index of teams by id, kept up to date by select and generate
+        self.teamsById = {}
+        for team in self.teams:
+            self.trackTeam(team)
+
         # track all created programs too
-        self.programs = []
+        self.programs = ProgramPool()
         for team in self.teams:
             for program in team.programs:
-                self.programs.append(program)
+                self.trackProgram(program)
+
+    """
+    Adds the team to the id index, and moves its scores into the score table.
+    """
+    def trackTeam(self, team):
+        self.teamsById[team.id] = team
+        team.outcomes = self.scoreTable.addAgent(team.id, team.outcomes)
+
+    """
+    Removes the team from the id index and score table, it keeps a plain dict
+    of its scores.
+    """
+    def untrackTeam(self, team):
+        del self.teamsById[team.id]
+        team.outcomes = self.scoreTable.removeAgent(team.id)
+
+    """
+    Adds the program to the pool of live programs, and its registers to the
+    register bank.
+    """
+    def trackProgram(self, prog):
+        if self.programs.add(prog):
+            self.registerBank.acquire(prog)
+
+    """
+    Drops a reference to the program, removing it from the pool and register
+    bank once no team has it.
+    """
+    def releaseProgram(self, prog):
+        if self.programs.release(prog):
+            self.registerBank.release(prog)
 
     """
     Returns all of the agents/programs. Sorted arbitrarilly unless sortTasks are
@@ -63,68 +128,228 @@ class TeamTrainer:
         if len(sortTasks) == 0:
             return list(teams)
         else:
-            return sorted(teams, key=lambda t: t.outcomes[sortTasks[0]], reverse=True)
+            if isinstance(sortTasks, str):
+                sortTasks = [sortTasks]
+            order = self.scoreTable.rank([team.id for team in teams], sortTasks[0])
+            return [teams[i] for i in order]
 
     def applyScores(self, scores): # used when multiprocessing
-        for score in scores:
-            for team in self.teams:
-                if score[0] == team.id:
-                    for task, outcome in score[1].items():
-                        team.outcomes[task] = outcome
-                    break # on to next score
+        for teamId, outcomes in scores:
+            team = self.teamsById.get(teamId)
+            if team is not None:
+                team.outcomes.update(outcomes)
 
         return self.teams
 
-    def evolve(self, tasks, fitType='min'):
-        self.getScoreStats(tasks)
-        self.select(tasks, fitType)
-        self.generate()
-        self.curGen += 1
+    """
+    Columnar version of applyScores. ids is an array of team ids, and scores a
+    (len(tasks), len(ids)) matrix with a row of scores for each task.
+    """
+    def applyScoreArrays(self, ids, tasks, scores):
+        if isinstance(tasks, str):
+            tasks = [tasks]
+        self.scoreTable.setScores(ids, tasks, scores)
 
-        # track new programs
-        for team in self.teams:
-            for prog in team.programs:
-                if prog not in self.programs:
-                    self.programs.append(prog)
+        return self.teams
 
-        for program in self.programs:
-            program.clearRegisters()
+    """
+    Selects on the scores for tasks and generates the next generation, with
+    pool and chunkSize passed on to generate.
+    """
+    def evolve(self, tasks, fitType='min', pool=None, chunkSize=100):
+        with phase(self.profiler, 'evolve'):
+            with phase(self.profiler, 'scoreStats'):
+                self.getScoreStats(tasks)
+            if self.resultCache is not None:
+                for team in self.teams:
+                    self.resultCache.store(team.getEffectiveKey(), team.outcomes)
+            with phase(self.profiler, 'select'):
+                self.select(tasks, fitType)
+            with phase(self.profiler, 'generate'):
+                self.generate(pool, chunkSize)
+            self.curGen += 1
+
+            with phase(self.profiler, 'clearRegisters'):
+                self.registerBank.clear()
+
+        if self.profiler is not None:
+            self.profileStats = self.profiler.endGeneration(self.curGen-1,
+                    self.programs)
 
     def select(self, tasks, fitType, norm=True): # select programs to keep
         numKeep = self.popSize - int(self.popSize * self.gap) # # agents to keep
-        rankedTeams = sorted(self.teams, key=lambda t: t.outcomes[tasks[0]], reverse=True)
+        if isinstance(tasks, str):
+            tasks = [tasks]
+        order = self.scoreTable.rank([team.id for team in self.teams], tasks[0])
+        rankedTeams = [self.teams[i] for i in order]
         self.teams = rankedTeams[:numKeep]
         delTeams = rankedTeams[numKeep:]
 
         for team in delTeams:
+            self.untrackTeam(team)
             for prog in team.programs:
-                prog.refs -= 1
-                if prog.refs == 0: # no more references (remove prog)
-                    self.programs.remove(prog)
+                self.releaseProgram(prog)
 
-    def generate(self): # generate new programs
+    """
+    Generates new teams from the kept ones. The teams are mutated one by one,
+    but the programs they mutate are mutated and decoded all at once (see
+    Program.mutatePrograms), fanned out on pool in chunks of chunkSize
+    programs if given, with the same result as without.
+    """
+    def generate(self, pool=None, chunkSize=100):
         parents = list(self.teams)
+        # programs to mutate teams with, as they are before any child is bred
+        allPrograms = list(self.programs)
         # generate this many new ones
-        for i in range((self.popSize - len(self.teams))):
-            p = random.choice(parents)
-            newTeam = Team(team=p, genCreate=self.curGen)
-            newTeam.mutate(pDel=self.pProgDel, pSwp=self.pProgSwp, pMut=self.pProgMut,
-                            allPrograms=list(self.programs), gen=self.curGen,
-                            pAddInst=Program.pInstAdd, pDelInst=Program.pInstDel,
-                                pSwpInst=Program.pInstSwp, pMutInst=Program.pInstMut)
-            self.teams.append(newTeam)
+        numNew = self.popSize - len(self.teams)
+        parentIdxs = self.rng.integers(len(parents), size=numNew)
+        with phase(self.profiler, 'mutate'):
+            deferred = {} # program mutations of all new teams
+            newTeams = [self.mutateCopy(parents[idx], rng, allPrograms, deferred)
+                        for idx, rng in zip(parentIdxs, self.spawnRngs(numNew))]
+            changed = Program.mutatePrograms(
+                    [prog for prog, _ in deferred.values()],
+                    [mutation for _, mutation in deferred.values()],
+                    pool, chunkSize)
+        if self.profiler is not None:
+            self.profiler.count('mutations', int(np.sum(changed)))
+
+        for idx, newTeam in zip(parentIdxs, newTeams):
+            self.addChild(newTeam, parents[idx])
+
+    """
+    New independent random streams, one per child to breed, so that each
+    child's mutations don't depend on the order children are bred in.
+    """
+    def spawnRngs(self, num):
+        return [np.random.default_rng(seq)
+                for seq in self.seedSequence.spawn(num)]
+
+    """
+    Adds a mutated copy of parent to the population, and returns it. Random
+    numbers come from rng, the trainer's stream if None. Programs replaced in
+    the team are drawn from allPrograms, the live programs if None.
+    """
+    def breed(self, parent, rng=None, allPrograms=None):
+        if rng is None:
+            rng = self.rng
+        if allPrograms is None:
+            allPrograms = self.programs
+        with phase(self.profiler, 'mutate'):
+            newTeam = self.mutateCopy(parent, rng, allPrograms)
+
+        return self.addChild(newTeam, parent)
+
+    """
+    Mutated copy of parent, see Team.mutate. Counts the program mutations that
+    changed a genome, other than deferred ones.
+    """
+    def mutateCopy(self, parent, rng, allPrograms, deferred=None):
+        newTeam = Team(team=parent, genCreate=self.curGen)
+        numMutated = newTeam.mutate(pDel=self.pProgDel, pSwp=self.pProgSwp,
+                pMut=self.pProgMut, allPrograms=allPrograms, gen=self.curGen,
+                pAddInst=Program.pInstAdd, pDelInst=Program.pInstDel,
+                pSwpInst=Program.pInstSwp, pMutInst=Program.pInstMut,
+                rng=rng, deferred=deferred)
+        if self.profiler is not None:
+            self.profiler.count('mutations', numMutated)
+        return newTeam
+
+    """
+    Adds a newly bred team to the population, and returns it.
+    """
+    def addChild(self, newTeam, parent):
+        self.teams.append(newTeam)
+        self.trackTeam(newTeam)
+
+        # track new programs, and drop the ones mutation left unreferenced
+        for prog in newTeam.programs:
+            self.trackProgram(prog)
+        for prog in parent.programs:
+            if prog.refs == 0 and prog in self.programs:
+                self.programs.remove(prog)
+                self.registerBank.release(prog)
+
+        # same behaviour as an evaluated team, reuse its scores
+        if self.resultCache is not None:
+            cached = self.resultCache.lookup(newTeam.getEffectiveKey())
+            if cached is not None:
+                newTeam.outcomes.update(cached)
+
+        return newTeam
+
+    """
+    Removes a team from the population, and its programs no other team has,
+    for steady state evolution.
+    """
+    def removeAgent(self, team):
+        if self.resultCache is not None:
+            self.resultCache.store(team.getEffectiveKey(), team.outcomes)
+        self.teams.remove(team)
+        self.untrackTeam(team)
+        for prog in team.programs:
+            self.releaseProgram(prog)
 
     def getScoreStats(self, tasks):
         if not isinstance(tasks, str):
             tasks = tasks[0] # deal with multi task reporting later
-        scores = []
-        for team in self.teams:
-            scores.append(team.outcomes.get(tasks, None))
+        scores = self.scoreTable.getMatrix(
+                [team.id for team in self.teams], tasks)[0]
+        present = scores[~np.isnan(scores)]
 
         self.scoreStats = {}
-        self.scoreStats['scores'] = scores
-        self.scoreStats['min'] = min(scores)
-        self.scoreStats['max'] = max(scores)
-        self.scoreStats['average'] = sum(scores)/len(scores)
+        self.scoreStats['scores'] = [None if np.isnan(score) else score
+                                        for score in scores.tolist()]
+        self.scoreStats['min'] = present.min()
+        self.scoreStats['max'] = present.max()
+        self.scoreStats['average'] = present.mean()
+        if self.resultCache is not None:
+            self.scoreStats['cache'] = self.resultCache.getStats()
 
         return self.scoreStats
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'rng' not in state: # saved before trainers had their own streams
+            self.seedSequence = np.random.SeedSequence()
+            self.rng = np.random.default_rng(self.seedSequence)
+        if 'scoreTable' not in state: # saved before the score table
+            Program.setStateConfig(state)
+            self.trackLegacyState()
+        elif isinstance(self.programs, list): # saved before the program pool
+            self.programs = ProgramPool(self.programs)
+        Program.profiler = self.profiler
+        # outcomes views are pickled as dicts, point them back to the table
+        for team in self.teams:
+            team.outcomes = self.scoreTable.addAgent(team.id)
+
+    """
+    Builds the state that trainers pickled before the score table lack, moving
+    the teams' plain dicts of scores into a new score table, and the programs
+    the teams refer to into a program pool.
+    """
+    def trackLegacyState(self):
+        self.profiler = None
+        Program.profiler = None
+        self.profileStats = {}
+        self.scoreTable = ScoreTable(capacity=self.popSize)
+        self.registerBank = RegisterBank(capacity=self.popSize*self.numActions)
+        self.resultCache = None
+        self.teamsById = {}
+        for team in self.teams:
+            self.trackTeam(team)
+
+        # recount the references, as the pool drops unreferenced programs
+        for prog in self.programs:
+            prog.refs = 0
+        for team in self.teams:
+            for prog in team.programs:
+                prog.refs += 1
+        self.programs = ProgramPool()
+        for team in self.teams:
+            for prog in team.programs:
+                self.trackProgram(prog)
+
+        # programs were decoded when unpickled, before the saved Program
+        # settings were set
+        Program.decodePrograms(list(self.programs))
@@ -1,6 +1,13 @@
-import random
+import numpy as np
 from lgp.program import Program
 from lgp.util import paretoDominate, paretoNonDominated
+from lgp.score_table import ScoreTable
+from lgp.result_cache import ResultCache
+from lgp.register_bank import RegisterBank
+from lgp.profiler import phase
+from lgp.lazy_import import lazyImport
+
+pareto = lazyImport('lgp.pareto')
 
 """
 Creates and maintains a population of programs.
@@ -9,7 +16,9 @@ class Trainer:
 
     def __init__(self, numActions, popSize=200, gap=0.5, maxProgSize=128,
             numMemRegs=8, numFgtRegs=8,
-            pInstAdd=0.08, pInstDel=0.06, pInstSwp=0.05, pInstMut=0.05, pProgMut=1):
+            pInstAdd=0.08, pInstDel=0.06, pInstSwp=0.05, pInstMut=0.05, pProgMut=1,
+            arrayGenome=False, cacheSize=0, cacheTasks=None, profiler=None,
+            seed=None):
 
         self.popSize = popSize
         self.gap = gap
@@ -22,29 +31,82 @@ class Trainer:
         Program.pInstDel = pInstDel
         Program.pInstSwp = pInstSwp
         Program.pInstMut = pInstMut
+        Program.arrayGenome = arrayGenome
+
+        # per generation instrumentation, off if None
+        self.profiler = profiler
+        Program.profiler = profiler
+        self.profileStats = {}
 
         self.curGen = 0
 
+        # the trainer's random stream, and independent child streams spawned
+        # from the seed sequence for breeding (see spawnRngs)
+        self.seedSequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seedSequence)
+
+        self.scoreTable = ScoreTable(capacity=popSize)
+        # registers of all programs
+        self.registerBank = RegisterBank(capacity=popSize)
+
+        # scores of evaluated programs by effective code, for deterministic
+        # tasks (cacheTasks, or all tasks if None)
+        self.resultCache = None
+        if cacheSize > 0:
+            self.resultCache = ResultCache(cacheSize, cacheTasks)
+
         self.initPop()
 
         self.scoreStats = {}
 
     def initPop(self):
-        self.programs = [Program(progSize=random.randint(1,Program.maxProgSize),
-                                 genCreate=self.curGen)
-                        for _ in range(self.popSize)]
+        progSizes = self.rng.integers(1, Program.maxProgSize, size=self.popSize,
+                endpoint=True)
+        self.programs = [Program(progSize=int(progSize), genCreate=self.curGen,
+                                 rng=self.rng)
+                        for progSize in progSizes]
+
+        # index of programs by id, kept up to date by select and generate
+        self.programsById = {}
+        for prog in self.programs:
+            self.trackProgram(prog)
+
+        # programs were decoded when unpickled, before the saved Program
+        # settings were set
+        Program.decodePrograms(list(self.programs))
+
+    """
+    Adds the program to the id index, moves its scores into the score table and
+    its registers into the register bank.
+    """
+    def trackProgram(self, prog):
+        self.programsById[prog.id] = prog
+        prog.outcomes = self.scoreTable.addAgent(prog.id, prog.outcomes)
+        self.registerBank.acquire(prog)
+
+    """
+    Removes the program from the id index, score table and register bank, it
+    keeps a plain dict of its scores and a copy of its registers.
+    """
+    def untrackProgram(self, prog):
+        del self.programsById[prog.id]
+        prog.outcomes = self.scoreTable.removeAgent(prog.id)
+        self.registerBank.release(prog)
 
     """
     Returns all of the agents/programs. Sorted arbitrarilly unless sortTasks are
     specified (single or list). Type is how to deal with multiple tasks ('min',
-    'max','avg','sum','paretoDominate','paretoNonDominated'). norm is whether to
-    normalize scores, good for pretty much all multiTask. skipTasks determine
+    'max','avg','sum','paretoDominate','paretoNonDominated','paretoRank'), where
+    paretoRank sorts by non-dominated front then crowding distance. norm is
+    whether to normalize scores, good for pretty much all multiTask. skipTasks determine
     individuals to skip if all tasks have scores. If byFitness, then uses just
     stored fitness on agents.
     """
     def getAgents(self, sortTasks=None, scoreType='min', norm=True, skipTasks=[]):
         if sortTasks is None: # just return all programs
-            return list(self.programs)
+            return [prog for prog in self.programs
+                    if any(task not in prog.outcomes for task in skipTasks)
+                        or len(skipTasks) == 0]
         else: # return sorted by new ranking
             return [prog for prog in self.progsScorer(sortTasks, scoreType, norm)
                     if any(task not in prog.outcomes for task in skipTasks)
@@ -56,70 +118,191 @@ class Trainer:
     stores the score in fitness variable of program.
     """
     def progsScorer(self, tasks, scoreType, norm, reverse=True):
-        # get min and max of each task for normalizing
-        minMaxs = None
-        if norm:
-            minMaxs = Program.getOverallMinMaxs(tasks, self.programs)
+        if isinstance(tasks, str):
+            tasks = [tasks]
+        ids = [prog.id for prog in self.programs]
 
         if 'pareto' not in scoreType: # just return obtained score
-            return sorted(self.programs,
-                    key=lambda prg:
-                           prg.getScore(tasks, sType=scoreType, minMaxs=minMaxs),
-                    reverse=reverse)
+            order = self.scoreTable.rank(ids, tasks, scoreType, norm, reverse)
+            return [self.programs[i] for i in order]
         else: # score based pareto front type stuff
+            # (agents, tasks) normalized scores
+            if norm:
+                scores = self.scoreTable.getNormalized(ids, tasks).T
+            else:
+                scores = self.scoreTable.getMatrix(ids, tasks).T
+
             if scoreType == 'paretoDominate':
-                return paretoDominate(self.programs,
-                        [prg.getScore(tasks, sType=scoreType, minMaxs=minMaxs)
-                                for prg in self.programs], reverse=reverse)
+                return paretoDominate(self.programs, scores, reverse=reverse)
             elif scoreType == 'paretoNonDominated':
-                return paretoNonDominated(self.programs,
-                        [prg.getScore(tasks, sType=scoreType, minMaxs=minMaxs)
-                                for prg in self.programs], reverse=reverse)
-
+                return paretoNonDominated(self.programs, scores, reverse=reverse)
+            elif scoreType == 'paretoRank':
+                return pareto.paretoRank(self.programs, scores, reverse=reverse)
 
     def applyScores(self, scores): # used when multiprocessing
-        for score in scores:
-            for program in self.programs:
-                if score[0] == program.id:
-                    for task, outcome in score[1].items():
-                        program.outcomes[task] = outcome
-                    break # on to next score
+        for progId, outcomes in scores:
+            program = self.programsById.get(progId)
+            if program is not None:
+                program.outcomes.update(outcomes)
 
         return self.programs
 
-    def evolve(self, tasks, fitType='min'):
-        self.getScoreStats(tasks)
-        self.select(tasks, fitType)
-        self.generate()
-        self.curGen += 1
-        for program in self.programs:
-            program.clearRegisters()
+    """
+    Columnar version of applyScores. ids is an array of program ids, and scores
+    a (len(tasks), len(ids)) matrix with a row of scores for each task.
+    """
+    def applyScoreArrays(self, ids, tasks, scores):
+        if isinstance(tasks, str):
+            tasks = [tasks]
+        self.scoreTable.setScores(ids, tasks, scores)
+
+        return self.programs
+
+    """
+    Selects on the scores for tasks and generates the next generation, with
+    pool and chunkSize passed on to generate.
+    """
+    def evolve(self, tasks, fitType='min', pool=None, chunkSize=100):
+        with phase(self.profiler, 'evolve'):
+            with phase(self.profiler, 'scoreStats'):
+                self.getScoreStats(tasks)
+            if self.resultCache is not None:
+                for prog in self.programs:
+                    self.resultCache.store(prog.getEffectiveKey(), prog.outcomes)
+            with phase(self.profiler, 'select'):
+                self.select(tasks, fitType)
+            with phase(self.profiler, 'generate'):
+                self.generate(pool, chunkSize)
+            self.curGen += 1
+
+            with phase(self.profiler, 'clearRegisters'):
+                self.registerBank.clear()
+
+        if self.profiler is not None:
+            self.profileStats = self.profiler.endGeneration(self.curGen-1,
+                    self.programs)
 
     def select(self, tasks, fitType, norm=True): # select programs to keep
         numKeep = self.popSize - int(self.popSize * self.gap) # # agents to keep
-        self.programs = self.progsScorer(tasks, fitType, norm)[:numKeep]
+        rankedProgs = self.progsScorer(tasks, fitType, norm)
+        self.programs = rankedProgs[:numKeep]
 
-    def generate(self): # generate new programs
+        for prog in rankedProgs[numKeep:]:
+            self.untrackProgram(prog)
+
+    """
+    Generates new programs from the kept ones, bred all at once (see
+    Program.breedPrograms). Mutation can be fanned out on pool, in chunks of
+    chunkSize programs, with the same result as without.
+    """
+    def generate(self, pool=None, chunkSize=100):
         parents = list(self.programs)
         # generate this many new ones
-        for i in range((self.popSize - len(self.programs))):
-            p = random.choice(parents)
-            newProg = Program(genCreate=self.curGen)
-            newProg.instructions = list(p.instructions)
-            newProg.mutate()
-            self.programs.append(newProg)
+        numNew = self.popSize - len(self.programs)
+        parentIdxs = self.rng.integers(len(parents), size=numNew)
+        with phase(self.profiler, 'mutate'):
+            children, changed = Program.breedPrograms(
+                    [parents[idx] for idx in parentIdxs], self.spawnRngs(numNew),
+                    self.curGen, pool, chunkSize)
+        if self.profiler is not None:
+            self.profiler.count('mutations', int(np.sum(changed)))
+
+        for child in children:
+            self.addChild(child)
+
+    """
+    New independent random streams, one per child to breed, so that each
+    child's mutations don't depend on the order children are bred in.
+    """
+    def spawnRngs(self, num):
+        return [np.random.default_rng(seq)
+                for seq in self.seedSequence.spawn(num)]
+
+    """
+    Adds a mutated copy of parent to the population, and returns it. Random
+    numbers come from rng, the trainer's stream if None.
+    """
+    def breed(self, parent, rng=None):
+        if rng is None:
+            rng = self.rng
+        with phase(self.profiler, 'mutate'):
+            children, changed = Program.breedPrograms([parent], [rng],
+                    self.curGen)
+        if changed[0] and self.profiler is not None:
+            self.profiler.count('mutations')
+
+        return self.addChild(children[0])
+
+    """
+    Adds a newly bred program to the population, and returns it.
+    """
+    def addChild(self, newProg):
+        self.programs.append(newProg)
+        self.trackProgram(newProg)
+
+        # same behaviour as an evaluated program, reuse its scores
+        if self.resultCache is not None:
+            cached = self.resultCache.lookup(newProg.getEffectiveKey())
+            if cached is not None:
+                newProg.outcomes.update(cached)
+
+        return newProg
+
+    """
+    Removes a program from the population, for steady state evolution.
+    """
+    def removeAgent(self, prog):
+        if self.resultCache is not None:
+            self.resultCache.store(prog.getEffectiveKey(), prog.outcomes)
+        self.programs.remove(prog)
+        self.untrackProgram(prog)
 
     def getScoreStats(self, tasks):
         if not isinstance(tasks, str):
             tasks = tasks[0] # deal with multi task reporting later
-        scores = []
-        for prog in self.programs:
-            scores.append(prog.outcomes.get(tasks, None))
+        scores = self.scoreTable.getMatrix(
+                [prog.id for prog in self.programs], tasks)[0]
+        present = scores[~np.isnan(scores)]
 
         self.scoreStats = {}
-        self.scoreStats['scores'] = scores
-        self.scoreStats['min'] = min(scores)
-        self.scoreStats['max'] = max(scores)
-        self.scoreStats['average'] = sum(scores)/len(scores)
+        self.scoreStats['scores'] = [None if np.isnan(score) else score
+                                        for score in scores.tolist()]
+        self.scoreStats['min'] = present.min()
+        self.scoreStats['max'] = present.max()
+        self.scoreStats['average'] = present.mean()
+        if self.resultCache is not None:
+            self.scoreStats['cache'] = self.resultCache.getStats()
 
         return self.scoreStats
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'rng' not in state: # saved before trainers had their own streams
+            self.seedSequence = np.random.SeedSequence()
+            self.rng = np.random.default_rng(self.seedSequence)
+        if 'scoreTable' not in state: # saved before the score table
+            Program.setStateConfig(state)
+            self.trackLegacyState()
+        Program.profiler = self.profiler
+        # outcomes views are pickled as dicts, point them back to the table
+        for prog in self.programs:
+            prog.outcomes = self.scoreTable.addAgent(prog.id)
+
+    """
+    Builds the state that trainers pickled before the score table lack, moving
+    the programs' plain dicts of scores into a new score table.
+    """
+    def trackLegacyState(self):
+        self.profiler = None
+        Program.profiler = None
+        self.profileStats = {}
+        self.scoreTable = ScoreTable(capacity=self.popSize)
+        self.registerBank = RegisterBank(capacity=self.popSize)
+        self.resultCache = None
+        self.programsById = {}
+        for prog in self.programs:
+            self.trackProgram(prog)
+
+        # programs were decoded when unpickled, before the saved Program
+        # settings were set
+        Program.decodePrograms(list(self.programs))
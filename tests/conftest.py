@@ -0,0 +1,15 @@
+import pytest
+from lgp.program import Program
+from lgp.team import Team
+
+"""
+Tests change the Program class settings, put them back after each.
+"""
+@pytest.fixture(autouse=True)
+def programConfig():
+    config = Program.getConfig()
+    teamIdCount = Team.idCount
+    yield
+    Program.setConfig(config)
+    Program.profiler = None
+    Team.idCount = teamIdCount
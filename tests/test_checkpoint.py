@@ -0,0 +1,100 @@
+import numpy as np
+from lgp.program import Program
+from lgp.team import Team
+from lgp.trainer import Trainer
+from lgp.team_trainer import TeamTrainer
+from lgp.checkpoint import saveCheckpoint, loadCheckpoint, CheckpointReader
+
+"""
+Checks that checkpoints load back exactly what was saved, and that a loaded
+trainer evolves on exactly as the saved one would have.
+"""
+
+def genomeScore(agent):
+    programs = agent.programs if isinstance(agent, Team) else [agent]
+    return float(sum(np.sum(np.asarray(prog.instructions) % 997)
+                     for prog in programs))
+
+"""
+Scores the agents that have no score yet (a child only), then evolves.
+"""
+def evolve(trainer, gens):
+    for _ in range(gens):
+        for agent in trainer.getAgents():
+            if 'task' not in agent.outcomes:
+                agent.reward('task', genomeScore(agent))
+        trainer.evolve(['task'])
+
+def programState(prog):
+    return (prog.id, prog.genCreate, [int(inst) for inst in prog.instructions],
+            prog.code.tobytes())
+
+"""
+Everything a checkpoint holds about the trainer, comparable with ==.
+"""
+def trainerState(trainer):
+    state = {
+        'config': Program.getConfig(),
+        'curGen': trainer.curGen,
+        'popSize': trainer.popSize,
+        'gap': trainer.gap,
+        'programs': [programState(prog) for prog in trainer.programs],
+        'rng': trainer.rng.bit_generator.state
+    }
+    if isinstance(trainer, TeamTrainer):
+        agents = trainer.teams
+        state['teamIdCount'] = Team.idCount
+        state['teams'] = [(team.id, team.genCreate,
+                           [prog.id for prog in team.programs])
+                          for team in agents]
+        state['refs'] = [prog.refs for prog in trainer.programs]
+    else:
+        agents = trainer.programs
+    state['outcomes'] = [dict(agent.outcomes) for agent in agents]
+    return state
+
+def checkRoundTrip(makeTrainer, fileName):
+    trainer = makeTrainer()
+    evolve(trainer, 2)
+    for agent in trainer.getAgents()[:3]:
+        agent.reward('other', -1.5)
+    saveCheckpoint(fileName, trainer)
+    saved = trainerState(trainer)
+
+    evolve(trainer, 2)
+    expected = trainerState(trainer)
+
+    loaded = loadCheckpoint(fileName)
+    assert trainerState(loaded) == saved
+    # the random streams are restored, so evolving goes on the same way
+    evolve(loaded, 2)
+    assert trainerState(loaded) == expected
+
+def testTrainerRoundTrip(tmp_path):
+    checkRoundTrip(lambda: Trainer(numActions=3, popSize=30, maxProgSize=32,
+            seed=0), str(tmp_path/'trainer.lgpc'))
+
+def testTrainerArrayGenomeRoundTrip(tmp_path):
+    checkRoundTrip(lambda: Trainer(numActions=3, popSize=30, maxProgSize=32,
+            arrayGenome=True, seed=1), str(tmp_path/'trainer.lgpc'))
+
+def testTeamTrainerRoundTrip(tmp_path):
+    checkRoundTrip(lambda: TeamTrainer(numActions=3, popSize=20, maxProgSize=32,
+            seed=2), str(tmp_path/'teams.lgpc'))
+
+def testAppendedFrames(tmp_path):
+    fileName = str(tmp_path/'frames.lgpc')
+    trainer = Trainer(numActions=2, popSize=20, maxProgSize=16, seed=3)
+    states = []
+    for gen in range(3):
+        evolve(trainer, 1)
+        saveCheckpoint(fileName, trainer, append=gen > 0)
+        states.append(trainerState(trainer))
+
+    reader = CheckpointReader(fileName)
+    assert reader.getGenerations() == [1, 2, 3]
+    for frame, state in enumerate(states):
+        assert trainerState(reader.loadTrainer(frame)) == state
+        reader.setConfig(frame)
+        assert [programState(reader.getProgram(i, frame))
+                for i in range(reader.getNumPrograms(frame))] == state['programs']
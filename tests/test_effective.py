@@ -0,0 +1,69 @@
+import numpy as np
+from lgp.program import Program
+from lgp import kernels
+
+"""
+Checks that skipping structural introns (markEffective) leaves the outputs and
+memory registers exactly as running every instruction does.
+"""
+
+def setRegisters(numOutRegs, numMemRegs, numFgtRegs):
+    Program.numOutRegs = numOutRegs
+    Program.numMemRegs = numMemRegs
+    Program.numFgtRegs = numFgtRegs
+
+"""
+One step of the program running all of its instructions, introns included.
+"""
+def runFullStream(prog, obs, regs):
+    modes, ops, dests, srcs = Program.decodeInstructions(prog.instructions)
+    regs[Program.numOutRegs+Program.numMemRegs:] = 0
+    kernels.runInstructions(obs, regs, modes, ops, dests, srcs, 0, len(modes))
+
+def testEffectiveMatchesFullStream():
+    rng = np.random.default_rng(0)
+    for numRegs in [(1, 0, 0), (4, 2, 2), (8, 8, 8)]:
+        setRegisters(*numRegs)
+        numLive = Program.numOutRegs+Program.numMemRegs
+        for _ in range(200):
+            prog = Program(progSize=int(rng.integers(1, 64, endpoint=True)),
+                    rng=rng)
+            regs = np.zeros(len(prog.registers))
+            for obs in rng.standard_normal((4, 6)):
+                runFullStream(prog, obs, regs)
+                prog.getAction(obs)
+                np.testing.assert_array_equal(prog.registers[:numLive],
+                        regs[:numLive])
+
+def testEffectiveSequentialActions():
+    rng = np.random.default_rng(1)
+    setRegisters(4, 4, 4)
+    obsMatrix = rng.standard_normal((10, 6))
+    for _ in range(50):
+        prog = Program(progSize=32, rng=rng)
+        regs = np.zeros(len(prog.registers))
+        expected = []
+        for obs in obsMatrix:
+            runFullStream(prog, obs, regs)
+            expected.append(regs[:Program.numOutRegs].copy())
+        np.testing.assert_array_equal(
+                prog.getActions(obsMatrix, sequential=True), expected)
+
+def testEffectiveProgramsMatchesSingle():
+    rng = np.random.default_rng(2)
+    setRegisters(4, 2, 2)
+    regSize = Program.numOutRegs+Program.numMemRegs+Program.numFgtRegs
+    numLive = Program.numOutRegs+Program.numMemRegs
+    programs = [Program(progSize=int(rng.integers(1, 64, endpoint=True)),
+                        rng=rng)
+                for _ in range(100)]
+    genomes, offsets = Program.packGenomes(programs)
+    modes, ops, dests, srcs = Program.decodeInstructions(genomes)
+    effective = kernels.markEffectivePrograms(modes, ops, dests, srcs, offsets,
+            regSize, numLive)
+    for i, prog in enumerate(programs):
+        start, end = offsets[i], offsets[i+1]
+        np.testing.assert_array_equal(effective[start:end],
+                kernels.markEffective(modes[start:end], ops[start:end],
+                        dests[start:end], srcs[start:end], regSize, numLive))
+        assert np.sum(effective[start:end]) == len(prog.modes)
@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+from lgp.program import Program
+from lgp.team import Team
+from lgp.trainer import Trainer
+from lgp.team_trainer import TeamTrainer
+from lgp.executor import PopulationExecutor, TeamExecutor
+
+"""
+Checks that the executors give exactly the actions of Program.getAction,
+Team.getAction and Program.getActions, with registers carrying over between
+steps the same way.
+"""
+
+"""
+Copy of the program with a copy of its registers, to run the reference on.
+"""
+def clone(prog):
+    copy = Program(program=prog)
+    if prog.regs is not None:
+        copy.regs = prog.regs.copy()
+    return copy
+
+"""
+Copies of the teams, programs shared between teams shared the same way.
+"""
+def cloneTeams(teams):
+    clones = {}
+    for team in teams:
+        for prog in team.programs:
+            if prog.id not in clones:
+                clones[prog.id] = clone(prog)
+    return [Team(programs=[clones[prog.id] for prog in team.programs])
+            for team in teams]
+
+def makeTrainer():
+    return Trainer(numActions=3, popSize=30, maxProgSize=32, numMemRegs=4,
+            numFgtRegs=2, seed=0)
+
+"""
+A team trainer a generation in, so that teams share programs.
+"""
+def makeTeamTrainer():
+    trainer = TeamTrainer(numActions=3, popSize=20, maxProgSize=32, numMemRegs=2,
+            numFgtRegs=2, seed=1)
+    for team in trainer.teams:
+        team.reward('task', float(team.id % 5))
+    trainer.evolve(['task'])
+    return trainer
+
+@pytest.mark.parametrize('useBank', [False, True])
+def testPopulationGetActions(useBank):
+    trainer = makeTrainer()
+    rng = np.random.default_rng(0)
+    clones = [clone(prog) for prog in trainer.programs]
+    executor = PopulationExecutor(trainer.programs,
+            trainer.registerBank if useBank else None)
+    for step in range(5):
+        if step % 2 == 0: # one observation for all
+            obs = rng.standard_normal(6)
+            expected = [prog.getAction(obs).copy() for prog in clones]
+        else: # an observation per program
+            obs = rng.standard_normal((len(clones), 6))
+            expected = [prog.getAction(row).copy()
+                        for prog, row in zip(clones, obs)]
+        if step == 4:
+            np.testing.assert_array_equal(
+                    executor.getActions(obs, actionType='single'),
+                    np.argmax(expected, axis=1))
+        else:
+            np.testing.assert_array_equal(executor.getActions(obs), expected)
+
+    if useBank: # the programs' own registers were run on
+        for prog, copy in zip(trainer.programs, clones):
+            np.testing.assert_array_equal(prog.registers, copy.registers)
+
+def testPopulationInterleavedWithGetAction():
+    trainer = makeTrainer()
+    rng = np.random.default_rng(1)
+    clones = [clone(prog) for prog in trainer.programs]
+    executor = PopulationExecutor(trainer.programs, trainer.registerBank)
+    for step in range(6):
+        obs = rng.standard_normal(6)
+        expected = [prog.getAction(obs).copy() for prog in clones]
+        if step % 2 == 0:
+            actions = executor.getActions(obs)
+        else:
+            actions = [prog.getAction(obs) for prog in trainer.programs]
+        np.testing.assert_array_equal(actions, expected)
+
+def testTeamGetActions():
+    trainer = makeTeamTrainer()
+    rng = np.random.default_rng(2)
+    clones = cloneTeams(trainer.teams)
+    executor = TeamExecutor(trainer.teams, trainer.registerBank)
+    for step in range(4):
+        if step % 2 == 0:
+            obs = rng.standard_normal(6)
+            expected = [team.getAction(obs) for team in clones]
+        else:
+            obs = rng.standard_normal((len(clones), 6))
+            expected = [team.getAction(row) for team, row in zip(clones, obs)]
+        np.testing.assert_array_equal(executor.getActions(obs), expected)
+
+def testTeamGetActionsDedup():
+    trainer = makeTeamTrainer()
+    rng = np.random.default_rng(3)
+    clones = cloneTeams(trainer.teams)
+    assert len({prog.id for team in clones for prog in team.programs}) < sum(
+            len(team.programs) for team in clones) # some programs are shared
+    executor = TeamExecutor(trainer.teams, trainer.registerBank, dedup=True)
+    for _ in range(4):
+        obs = rng.standard_normal(6)
+        # each distinct program steps once
+        actions = {}
+        for team in clones:
+            for prog in team.programs:
+                if prog.id not in actions:
+                    actions[prog.id] = prog.getAction(obs)[0]
+        expected = [[actions[prog.id] for prog in team.programs]
+                    for team in clones]
+        np.testing.assert_array_equal(executor.getActions(obs), expected)
+
+@pytest.mark.parametrize('useBank', [False, True])
+def testGetBatchActions(useBank):
+    trainer = makeTrainer()
+    rng = np.random.default_rng(4)
+    # nonzero memory registers to start the rows from
+    for prog in trainer.programs:
+        prog.getAction(rng.standard_normal(6))
+    clones = [clone(prog) for prog in trainer.programs]
+    registers = [prog.registers.copy() for prog in trainer.programs]
+    executor = PopulationExecutor(trainer.programs,
+            trainer.registerBank if useBank else None)
+    obsMatrix = rng.standard_normal((150, 6))
+    expected = np.array([prog.getActions(obsMatrix) for prog in clones])
+    for numThreads in [None, 1, 2]:
+        for rowBlock in [1, 7, 64, 200]:
+            np.testing.assert_array_equal(executor.getBatchActions(obsMatrix,
+                    numThreads=numThreads, rowBlock=rowBlock), expected)
+    np.testing.assert_array_equal(
+            executor.getBatchActions(obsMatrix, actionType='single'),
+            np.argmax(expected, axis=2))
+    # each row is run from the registers as they were, which are kept
+    for prog, regs in zip(trainer.programs, registers):
+        np.testing.assert_array_equal(prog.registers, regs)
+    np.testing.assert_array_equal(clones[0].getActions(obsMatrix[:1])[0],
+            clones[0].getAction(obsMatrix[0]))
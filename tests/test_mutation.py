@@ -0,0 +1,117 @@
+import numpy as np
+from lgp.program import Program
+from lgp import kernels
+
+"""
+Checks that list and array genomes mutate the same way from the same drawn
+random numbers, including at the edges: one instruction, maxProgSize
+instructions and instructions of value 0.
+"""
+
+"""
+Mutates a copy of insts with both backends, checks they agree and returns the
+result.
+"""
+def mutateBoth(insts, draws, newInsts, pAdd, pDel, pSwp, pMut):
+    listGenome = [int(inst) for inst in insts]
+    listChanged = Program.mutateList(listGenome, draws, newInsts,
+            pAdd, pDel, pSwp, pMut)
+    arrayGenome, arrayChanged = kernels.mutateInstructions(
+            np.array(insts, dtype=Program.genomeDtype()), draws, newInsts,
+            pDel, pSwp, pMut, pAdd, Program.maxProgSize)
+    assert listGenome == arrayGenome.tolist()
+    assert listChanged == arrayChanged
+    return listGenome, listChanged
+
+"""
+Draws doing nothing, for the edge cases to set only the trials they need.
+"""
+def noDraws(numInsts):
+    draws = np.full((4, numInsts, 3), 0.5)
+    draws[:, :, 0] = 1
+    return draws, np.zeros(numInsts, dtype=Program.genomeDtype())
+
+def testRandomMutationsMatch():
+    rng = np.random.default_rng(0)
+    Program.maxProgSize = 32
+    maxInst = 2**sum(Program.instLengths)-1
+    for chances in [(0.08, 0.06, 0.05, 0.05), (0.5, 0.5, 0.5, 0.5),
+                    (1, 1, 1, 1), (0, 1, 0, 0), (1, 0, 0, 0)]:
+        for _ in range(300):
+            numInsts = int(rng.integers(1, Program.maxProgSize, endpoint=True))
+            insts = rng.integers(0, maxInst, size=numInsts, endpoint=True)
+            # some instructions at the extremes
+            insts[rng.random(numInsts) < 0.1] = 0
+            insts[rng.random(numInsts) < 0.1] = maxInst
+            draws, newInsts = Program.drawMutations(numInsts, rng)
+            genome, _ = mutateBoth(insts, draws, newInsts, *chances)
+            assert 1 <= len(genome) <= Program.maxProgSize
+            assert all(0 <= inst <= maxInst for inst in genome)
+
+def testMutateGenomesMatch():
+    rng = np.random.default_rng(1)
+    Program.maxProgSize = 32
+    Program.pInstAdd, Program.pInstDel = 0.3, 0.3
+    Program.pInstSwp, Program.pInstMut = 0.3, 0.3
+    genomes = [rng.integers(0, 2**32, size=int(rng.integers(1, 33)))
+               for _ in range(100)]
+    mutations = [Program.drawMutations(len(genome), rng) for genome in genomes]
+
+    Program.arrayGenome = False
+    listGenomes, listChanged = Program.mutateGenomes(
+            [genome.tolist() for genome in genomes], mutations)
+    Program.arrayGenome = True
+    arrayGenomes, arrayChanged = Program.mutateGenomes(
+            [genome.astype(Program.genomeDtype()) for genome in genomes],
+            mutations)
+    assert listGenomes == [genome.tolist() for genome in arrayGenomes]
+    np.testing.assert_array_equal(listChanged, arrayChanged)
+    # the same as mutating each genome on its own
+    for genome, (draws, newInsts), expected in zip(genomes, mutations,
+                                                   listGenomes):
+        assert Program.mutateGenome(genome.astype(Program.genomeDtype()),
+                draws, newInsts, 0.3, 0.3, 0.3, 0.3)[0].tolist() == expected
+
+def testNoDeleteOfLastInstruction():
+    draws, newInsts = noDraws(1)
+    draws[0, 0] = [0, 0.5, 0] # delete
+    assert mutateBoth([5], draws, newInsts, 0, 1, 0, 0) == ([5], False)
+
+    # deleting stops at one instruction left
+    draws, newInsts = noDraws(3)
+    draws[0, :, 0] = 0
+    assert mutateBoth([5, 6, 7], draws, newInsts, 0, 1, 0, 0) == ([5], True)
+
+def testNoAddAtMaxProgSize():
+    Program.maxProgSize = 3
+    draws, newInsts = noDraws(3)
+    draws[3, :, 0] = 0 # add everywhere
+    newInsts[:] = 9
+    assert mutateBoth([1, 2, 3], draws, newInsts, 1, 0, 0, 0) == ([1, 2, 3],
+                                                                  False)
+
+    # adding stops at maxProgSize, and never adds at the very end
+    Program.maxProgSize = 4
+    draws[3, :, 1] = 0.999
+    assert mutateBoth([1, 2, 3], draws, newInsts, 1, 0, 0, 0) == ([1, 2, 9, 3],
+                                                                  True)
+
+def testFlipZeroInstruction():
+    draws, newInsts = noDraws(2)
+    draws[2, 0] = [0, 0, 0.99] # flip in the first instruction
+    # a 0 instruction has one bit to flip
+    assert mutateBoth([0, 0], draws, newInsts, 0, 0, 0, 1) == ([1, 0], True)
+    # flips stay within the instruction's bit length
+    assert mutateBoth([0b100, 0], draws, newInsts, 0, 0, 0, 1) == ([0, 0], True)
+    maxInst = 2**sum(Program.instLengths)-1
+    assert mutateBoth([maxInst, 0], draws, newInsts, 0, 0, 0, 1) == (
+            [maxInst - 2**(sum(Program.instLengths)-1), 0], True)
+
+def testSwapPicksDifferentInstructions():
+    draws, newInsts = noDraws(2)
+    draws[1, 0] = [0, 0.99, 0.99] # both picks on the last instruction
+    assert mutateBoth([1, 2], draws, newInsts, 0, 0, 1, 0) == ([2, 1], True)
+    # a single instruction isn't swapped
+    draws, newInsts = noDraws(1)
+    draws[1, 0] = [0, 0, 0]
+    assert mutateBoth([1], draws, newInsts, 0, 0, 1, 0) == ([1], False)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from lgp.executor import PopulationExecutor
+from lgp.parallel import ParallelEvaluator
+from lgp.steady_state import SteadyStateEvolver
+from lgp.trainer import Trainer
+
+"""
+Checks that ParallelEvaluator gives the scores of running the episode function
+in process, with workers started from a process that ran parallel kernels.
+"""
+
+def runEpisode(prog):
+    actions = PopulationExecutor([prog]).getBatchActions(np.ones((5, 4)))
+    return {'task': float(np.nan_to_num(actions).sum())}
+
+@pytest.mark.parametrize('context', ['spawn', 'forkserver'])
+def testEvaluateMatchesInProcess(context):
+    trainer = Trainer(numActions=3, popSize=20, maxProgSize=16, seed=0)
+    expected = {prog.id: runEpisode(prog) for prog in trainer.programs}
+    with ParallelEvaluator(runEpisode, numWorkers=2, context=context) as evaluator:
+        results = evaluator.evaluate(trainer)
+    assert dict(results) == expected
+    assert all(prog.outcomes['task'] == expected[prog.id]['task']
+               for prog in trainer.programs)
+
+def testSteadyStateAsksAgainAfterCachedChildren():
+    trainer = Trainer(numActions=3, popSize=10, maxProgSize=16, cacheSize=100,
+            seed=0)
+    evolver = SteadyStateEvolver(trainer, 'task')
+    for _ in range(trainer.popSize):
+        agent = evolver.ask()
+        evolver.tell(agent.id, runEpisode(agent))
+
+    # the first popSize children bred get cached scores, no others
+    hits = [trainer.popSize]
+    def hitLookup(key):
+        if hits[0] > 0:
+            hits[0] -= 1
+            return {'task': 0.0}
+        return None
+    trainer.resultCache.lookup = hitLookup
+
+    with ParallelEvaluator(runEpisode, numWorkers=1,
+            context='forkserver') as evaluator:
+        evaluator.evolveSteadyState(evolver, 5)
+    assert evolver.numTold == 2*trainer.popSize + 5
+    assert evolver.inFlight == {}
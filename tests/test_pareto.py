@@ -0,0 +1,105 @@
+import numpy as np
+from lgp import pareto
+from lgp.util import paretoDominate, paretoNonDominated
+
+"""
+Checks the compiled pareto ranking against brute force over all pairs.
+"""
+
+def dominates(a, b):
+    return np.all(a >= b) and np.any(a > b)
+
+"""
+Fronts by repeatedly peeling off the agents no remaining agent dominates.
+"""
+def bruteFronts(scores):
+    ranks = np.full(len(scores), -1)
+    front = 0
+    while np.any(ranks == -1):
+        remaining = np.flatnonzero(ranks == -1)
+        for i in remaining:
+            if not any(dominates(scores[j], scores[i]) for j in remaining):
+                ranks[i] = front
+        front += 1
+    return ranks
+
+def bruteCrowding(scores, ranks):
+    distances = np.zeros(len(scores))
+    for front in np.unique(ranks):
+        members = np.flatnonzero(ranks == front)
+        if len(members) <= 2:
+            distances[members] = np.inf
+            continue
+        for o in range(scores.shape[1]):
+            byScore = sorted(members, key=lambda i: scores[i, o])
+            span = scores[byScore[-1], o] - scores[byScore[0], o]
+            distances[byScore[0]] = distances[byScore[-1]] = np.inf
+            for prev, i, nxt in zip(byScore, byScore[1:], byScore[2:]):
+                if span > 0:
+                    distances[i] += (scores[nxt, o] - scores[prev, o])/span
+    return distances
+
+"""
+Random score matrices, some with few distinct values for ties and duplicates.
+"""
+def randomScores(rng):
+    for numObjs in [2, 3, 4]:
+        for n in [1, 2, 5, 30, 100]:
+            yield rng.standard_normal((n, numObjs))
+            yield rng.integers(0, 4, size=(n, numObjs)).astype(np.float64)
+
+def testNonDominatedSort():
+    rng = np.random.default_rng(0)
+    for scores in randomScores(rng):
+        np.testing.assert_array_equal(pareto.nonDominatedSort(scores),
+                bruteFronts(scores))
+
+def testSortFrontsBothObjectives():
+    # sortFronts handles any number of objectives, check it on 2 as well
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        scores = rng.integers(0, 6, size=(50, 2)).astype(np.float64)
+        order = np.lexsort(-scores.T[::-1])
+        expected = bruteFronts(scores)
+        np.testing.assert_array_equal(pareto.sortFronts(scores, order), expected)
+        np.testing.assert_array_equal(pareto.sortFronts2(scores, order),
+                expected)
+
+def testCountDominance():
+    rng = np.random.default_rng(2)
+    for scores in randomScores(rng):
+        n = len(scores)
+        expectedDominates = [sum(np.all(scores[i] >= scores[j])
+                                for j in range(n) if j != i)
+                            for i in range(n)]
+        expectedDominatedBy = [sum(np.all(scores[j] > scores[i])
+                                  for j in range(n) if j != i)
+                              for i in range(n)]
+        dominates, dominatedBy = pareto.countDominance(scores)
+        np.testing.assert_array_equal(dominates, expectedDominates)
+        np.testing.assert_array_equal(dominatedBy, expectedDominatedBy)
+
+        agents = list(range(n))
+        assert ([expectedDominates[i] for i in paretoDominate(agents, scores)]
+                == sorted(expectedDominates, reverse=True))
+        assert ([expectedDominatedBy[i]
+                    for i in paretoNonDominated(agents, scores)]
+                == sorted(expectedDominatedBy))
+
+def testParetoRank():
+    rng = np.random.default_rng(3)
+    for scores in randomScores(rng):
+        ranks = bruteFronts(scores)
+        distances = bruteCrowding(scores, ranks)
+        if len(np.unique(scores, axis=0)) == len(scores):
+            np.testing.assert_allclose(
+                    pareto.crowdingDistance(scores, ranks), distances)
+
+        agents = list(range(len(scores)))
+        ranked = pareto.paretoRank(agents, scores)
+        assert sorted(ranked) == agents
+        # by front, then descending crowding distance within a front
+        keys = [(ranks[i], -distances[i]) for i in ranked]
+        assert all(a[0] < b[0] or (a[0] == b[0] and a[1] <= b[1] + 1e-9)
+                   for a, b in zip(keys, keys[1:]))
+        assert pareto.paretoRank(agents, scores, reverse=False) == ranked[::-1]
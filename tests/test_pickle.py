@@ -0,0 +1,187 @@
+import copyreg
+import pickle
+import numpy as np
+from lgp.program import Program
+from lgp.team import Team
+from lgp.trainer import Trainer
+from lgp.team_trainer import TeamTrainer
+from lgp.util import loadProgram, saveTrainer, loadTrainer, saveTeam, loadTeam
+
+"""
+Checks that pickles saved before this version load back, and run as they did.
+"""
+
+"""
+Pickles as an instance of cls with a plain dict of attributes, as Program,
+Team and the trainers were pickled before.
+"""
+class Legacy:
+
+    def __init__(self, cls, state):
+        self.cls = cls
+        self.state = state
+
+    # pickle checks the class of objects saved with __newobj__
+    @property
+    def __class__(self):
+        return self.cls
+
+    def __reduce__(self):
+        return (copyreg.__newobj__, (self.cls,), self.state)
+
+# Program class variables the old save functions stored on the saved object
+legacyConfig = {'maxProgSize': 16, 'numOutRegs': 3, 'numMemRegs': 2,
+        'numFgtRegs': 1, 'pInstAdd': 0.1, 'pInstDel': 0.2, 'pInstSwp': 0.3,
+        'pInstMut': 0.4, 'idCount': 1000, 'instLengths': [1, 3, 5, 23]}
+
+"""
+An old program: its genome, all of its instructions decoded and its registers.
+"""
+def legacyProgram(progId, rng, refs=None):
+    instructions = rng.integers(0, 2**32, size=int(rng.integers(1, 17))).tolist()
+    modes, ops, dests, srcs = Program.decodeInstructions(instructions)
+    state = {'instructions': instructions, 'id': progId, 'genCreate': 0,
+             'registers': np.zeros(6), 'modes': modes, 'ops': ops,
+             'dests': dests, 'srcs': srcs, 'outcomes': {'task': float(progId)},
+             'fitness': None}
+    if refs is not None:
+        state['refs'] = refs
+    return Legacy(Program, state)
+
+"""
+Loads fileName in a process where the Program settings are the defaults, not
+the saved ones.
+"""
+def loadFresh(loadFn, fileName):
+    Program.setConfig({'maxProgSize': 128, 'numOutRegs': 8, 'numMemRegs': 8,
+            'numFgtRegs': 8, 'idCount': 0})
+    return loadFn(fileName)
+
+"""
+Code each program should have, decoded with the saved Program settings.
+"""
+def checkDecoded(programs):
+    for prog in programs:
+        expected = Program(instructions=prog.instructions, decode=False)
+        expected.extractInstructionsData()
+        assert prog.code.tobytes() == expected.code.tobytes()
+        assert len(prog.registers) == 6
+
+def checkConfig():
+    config = Program.getConfig()
+    for name, value in legacyConfig.items():
+        if name != 'idCount': # moved by checkDecoded
+            assert config[name] == value
+
+def testLegacyProgram(tmp_path):
+    fileName = str(tmp_path/'program.pkl')
+    legacy = legacyProgram(7, np.random.default_rng(0))
+    legacy.state.update(legacyConfig)
+    pickle.dump(legacy, open(fileName, 'wb'))
+
+    prog = loadFresh(loadProgram, fileName)
+    assert Program.idCount == 1000
+    checkConfig()
+    assert prog.id == 7 and prog.outcomes == {'task': 7.0}
+    checkDecoded([prog])
+
+def testLegacyTrainer(tmp_path):
+    fileName = str(tmp_path/'trainer.pkl')
+    rng = np.random.default_rng(1)
+    programs = [legacyProgram(progId, rng) for progId in range(20)]
+    state = {'popSize': 20, 'gap': 0.5, 'curGen': 3, 'programs': programs,
+             'scoreStats': {}}
+    state.update(legacyConfig)
+    pickle.dump(Legacy(Trainer, state), open(fileName, 'wb'))
+
+    trainer = loadFresh(loadTrainer, fileName)
+    assert Program.idCount == 1000
+    checkConfig()
+    assert [prog.id for prog in trainer.programs] == list(range(20))
+    assert [dict(prog.outcomes) for prog in trainer.programs] == [
+            {'task': float(progId)} for progId in range(20)]
+    checkDecoded(trainer.programs)
+    trainer.evolve(['task'])
+    assert len(trainer.programs) == 20
+
+def testLegacyTeamTrainer(tmp_path):
+    fileName = str(tmp_path/'teams.pkl')
+    rng = np.random.default_rng(2)
+    programs = [legacyProgram(progId, rng, refs=0) for progId in range(12)]
+    teams = []
+    for teamId in range(5):
+        members = [programs[idx] for idx in rng.choice(12, 3, replace=False)]
+        for prog in members:
+            prog.state['refs'] += 1
+        teams.append(Legacy(Team, {'programs': members, 'genCreate': 0,
+                'outcomes': {'task': float(teamId)}, 'id': teamId}))
+    state = {'numActions': 3, 'popSize': 5, 'gap': 0.5, 'pProgDel': 0.7,
+             'pProgSwp': 0.6, 'pProgMut': 0.65, 'curGen': 1, 'teams': teams,
+             'programs': programs, 'scoreStats': {}}
+    state.update(legacyConfig)
+    pickle.dump(Legacy(TeamTrainer, state), open(fileName, 'wb'))
+
+    trainer = loadFresh(loadTrainer, fileName)
+    checkConfig()
+    assert [team.id for team in trainer.teams] == list(range(5))
+    assert [dict(team.outcomes) for team in trainer.teams] == [
+            {'task': float(teamId)} for teamId in range(5)]
+    # only the programs on teams are kept, with their references recounted
+    members = {prog.id: prog for team in trainer.teams for prog in team.programs}
+    assert sorted(prog.id for prog in trainer.programs) == sorted(members)
+    for prog in trainer.programs:
+        assert prog.refs == sum(member is prog for team in trainer.teams
+                                for member in team.programs)
+    checkDecoded(trainer.programs)
+    trainer.evolve(['task'])
+    assert len(trainer.teams) == 5
+
+def testLegacyTeam(tmp_path):
+    fileName = str(tmp_path/'team.pkl')
+    rng = np.random.default_rng(3)
+    state = {'programs': [legacyProgram(progId, rng, refs=1)
+                          for progId in range(3)],
+             'genCreate': 0, 'outcomes': {}, 'id': 4, 'tIdCount': 9}
+    state.update(legacyConfig)
+    # the old saveTeam stored maxProgSize under this name
+    state['ProgmaxProgSize'] = state.pop('maxProgSize')
+    pickle.dump(Legacy(Team, state), open(fileName, 'wb'))
+
+    team = loadFresh(loadTeam, fileName)
+    checkConfig()
+    assert Team.idCount == 9
+    assert [prog.id for prog in team.programs] == [0, 1, 2]
+    checkDecoded(team.programs)
+
+def testTrainerArrayGenome(tmp_path):
+    fileName = str(tmp_path/'trainer.pkl')
+    trainer = Trainer(numActions=3, popSize=20, maxProgSize=16,
+            arrayGenome=True, seed=0)
+    saveTrainer(fileName, trainer)
+
+    Program.arrayGenome = False
+    trainer = loadFresh(loadTrainer, fileName)
+    assert Program.arrayGenome
+    for agent in trainer.getAgents():
+        agent.reward('task', float(trainer.rng.random()))
+    trainer.evolve(['task'])
+    assert all(isinstance(prog.instructions, np.ndarray)
+               for prog in trainer.programs)
+
+def testTeamRoundTrip(tmp_path):
+    fileName = str(tmp_path/'team.pkl')
+    trainer = TeamTrainer(numActions=3, popSize=5, maxProgSize=16,
+            numMemRegs=2, seed=0)
+    team = trainer.teams[0]
+    ids = [prog.id for prog in team.programs]
+    config = Program.getConfig()
+    teamIdCount = Team.idCount
+    saveTeam(fileName, team)
+
+    Team.idCount = 0
+    loaded = loadFresh(loadTeam, fileName)
+    assert Program.getConfig() == config
+    assert Team.idCount == teamIdCount
+    assert [prog.id for prog in loaded.programs] == ids
+    obs = np.ones(4)
+    assert loaded.getAction(obs) == team.getAction(obs)
@@ -0,0 +1,148 @@
+import math
+import numpy as np
+import pytest
+from lgp.score_table import ScoreTable
+from lgp.trainer import Trainer
+
+"""
+Checks ScoreTable scoring and ranking against the dict based scoring it
+replaced (Program.getScore and Program.getOverallMinMaxs).
+"""
+
+"""
+[min, max] of each task over the agents' outcomes dicts that have it.
+"""
+def dictMinMaxs(tasks, outcomesList):
+    minMaxs = []
+    for task in tasks:
+        scores = [outcomes[task] for outcomes in outcomesList if task in outcomes]
+        minMaxs.append([min(scores), max(scores)] if scores else None)
+    return minMaxs
+
+def dictScore(outcomes, tasks, sType, minMaxs):
+    if len(tasks) == 1:
+        return outcomes[tasks[0]]
+
+    scores = [outcomes[task] for task in tasks]
+    if minMaxs is not None:
+        for i, mm in enumerate(minMaxs):
+            try:
+                scores[i] = (scores[i]-mm[0])/(mm[1]-mm[0])
+            except ZeroDivisionError:
+                scores[i] = 0
+
+    if sType == 'min':
+        return min(scores)
+    elif sType == 'max':
+        return max(scores)
+    elif sType == 'avg':
+        return sum(scores)/len(scores)
+    elif sType == 'sum':
+        return sum(scores)
+
+"""
+Indices of the agents sorted by their dict scores, agents missing one of the
+tasks last.
+"""
+def dictRank(outcomesList, tasks, sType, norm, reverse=True):
+    minMaxs = dictMinMaxs(tasks, outcomesList) if norm else None
+    scored = [i for i, outcomes in enumerate(outcomesList)
+              if all(task in outcomes for task in tasks)]
+    missing = [i for i in range(len(outcomesList)) if i not in scored]
+    order = sorted(scored, key=lambda i: dictScore(outcomesList[i], tasks,
+            sType, minMaxs), reverse=reverse)
+    return order + missing
+
+"""
+Random outcomes dicts, with few distinct values for ties if ties, and some
+scores missing if missing.
+"""
+def randomOutcomes(rng, numAgents, tasks, ties, missing):
+    outcomesList = []
+    for _ in range(numAgents):
+        outcomes = {}
+        for task in tasks:
+            if missing and rng.random() < 0.15:
+                continue
+            if ties:
+                outcomes[task] = float(rng.integers(0, 3))
+            else:
+                outcomes[task] = float(rng.standard_normal()*10)
+        outcomesList.append(outcomes)
+    # a task with no spread
+    for outcomes in outcomesList:
+        if 'flat' in outcomes:
+            outcomes['flat'] = 1.0
+    return outcomesList
+
+def makeTable(outcomesList):
+    table = ScoreTable(capacity=4)
+    for agentId, outcomes in enumerate(outcomesList):
+        table.addAgent(agentId, outcomes)
+    return table
+
+scoreCases = [(sType, norm, ties, missing)
+              for sType in ['min', 'max', 'avg', 'sum']
+              for norm in [True, False]
+              for ties in [False, True]
+              for missing in [False, True]]
+
+@pytest.mark.parametrize('sType,norm,ties,missing', scoreCases)
+def testRankMatchesDictScoring(sType, norm, ties, missing):
+    rng = np.random.default_rng(0)
+    for tasks in [['a'], ['a', 'b'], ['a', 'b', 'c'], ['a', 'flat']]:
+        outcomesList = randomOutcomes(rng, 50, ['a', 'b', 'c', 'flat'], ties,
+                missing)
+        table = makeTable(outcomesList)
+        ids = list(range(len(outcomesList)))
+        for reverse in [True, False]:
+            expected = dictRank(outcomesList, tasks, sType, norm, reverse)
+            order = table.rank(ids, tasks, sType, norm, reverse).tolist()
+            # agents missing scores come last, in order, either way
+            numScored = sum(all(task in outcomes for task in tasks)
+                            for outcomes in outcomesList)
+            if reverse:
+                assert order == expected
+            else:
+                assert order[:numScored] == expected[:numScored]
+                assert sorted(order[numScored:]) == order[numScored:]
+
+@pytest.mark.parametrize('sType,norm,ties,missing', scoreCases)
+def testAggregateMatchesDictScoring(sType, norm, ties, missing):
+    rng = np.random.default_rng(1)
+    tasks = ['a', 'b', 'flat']
+    outcomesList = randomOutcomes(rng, 40, tasks, ties, missing)
+    table = makeTable(outcomesList)
+    ids = list(range(len(outcomesList)))
+    minMaxs = dictMinMaxs(tasks, outcomesList)
+    np.testing.assert_array_equal(table.getMinMaxs(ids, tasks), minMaxs)
+
+    scores = table.aggregate(ids, tasks, sType, norm)
+    normed = table.getNormalized(ids, tasks)
+    for i, outcomes in enumerate(outcomesList):
+        if all(task in outcomes for task in tasks):
+            assert scores[i] == pytest.approx(dictScore(outcomes, tasks, sType,
+                    minMaxs if norm else None), rel=1e-12, abs=1e-12)
+        else:
+            assert math.isnan(scores[i])
+        for row, (task, mm) in enumerate(zip(tasks, minMaxs)):
+            if task not in outcomes:
+                assert math.isnan(normed[row, i])
+            elif mm[0] == mm[1]:
+                assert normed[row, i] == 0
+            else:
+                assert normed[row, i] == pytest.approx(
+                        (outcomes[task]-mm[0])/(mm[1]-mm[0]), rel=1e-12)
+
+@pytest.mark.parametrize('sType', ['min', 'max', 'avg', 'sum'])
+def testTrainerGetAgentsMatchesDictScoring(sType):
+    rng = np.random.default_rng(2)
+    trainer = Trainer(numActions=2, popSize=30, maxProgSize=8, seed=0)
+    tasks = ['a', 'b']
+    outcomesList = randomOutcomes(rng, 30, tasks, ties=True, missing=False)
+    for prog, outcomes in zip(trainer.programs, outcomesList):
+        prog.outcomes.update(outcomes)
+    for norm in [True, False]:
+        expected = [trainer.programs[i]
+                    for i in dictRank(outcomesList, tasks, sType, norm)]
+        assert trainer.getAgents(tasks, sType, norm) == expected
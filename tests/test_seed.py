@@ -0,0 +1,145 @@
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from lgp.program import Program
+from lgp.team import Team
+from lgp.trainer import Trainer
+from lgp.team_trainer import TeamTrainer
+
+"""
+Checks that a seeded trainer gives the same population every run, whether
+children are bred in bulk, one at a time, or over pools of any size.
+"""
+
+trainerCases = [(Trainer, False), (Trainer, True),
+                (TeamTrainer, False), (TeamTrainer, True)]
+
+def makeTrainer(cls, arrayGenome, seed):
+    # ids are part of the population, start them from the same place
+    Program.idCount = 0
+    Team.idCount = 0
+    return cls(numActions=3, popSize=40, maxProgSize=32, arrayGenome=arrayGenome,
+            seed=seed)
+
+def score(trainer):
+    for agent in trainer.getAgents():
+        if 'task' not in agent.outcomes:
+            programs = agent.programs if isinstance(agent, Team) else [agent]
+            agent.reward('task', float(sum(len(prog.instructions) % 7
+                                           for prog in programs)))
+
+"""
+Ids, genomes and decoded code of the population, and team members.
+"""
+def population(trainer):
+    programs = [(prog.id, [int(inst) for inst in prog.instructions],
+                 prog.code.tobytes()) for prog in trainer.programs]
+    if isinstance(trainer, TeamTrainer):
+        return programs, [(team.id, [prog.id for prog in team.programs])
+                          for team in trainer.teams]
+    return programs
+
+"""
+generate breeding one child at a time with breed.
+"""
+def serialGenerate(trainer):
+    if isinstance(trainer, TeamTrainer):
+        parents = list(trainer.teams)
+    else:
+        parents = list(trainer.programs)
+    allPrograms = list(trainer.programs)
+    numNew = trainer.popSize - len(parents)
+    parentIdxs = trainer.rng.integers(len(parents), size=numNew)
+    for idx, rng in zip(parentIdxs, trainer.spawnRngs(numNew)):
+        if isinstance(trainer, TeamTrainer):
+            trainer.breed(parents[idx], rng, allPrograms)
+        else:
+            trainer.breed(parents[idx], rng)
+
+def run(cls, arrayGenome, seed=0, generateFn=None, gens=3):
+    trainer = makeTrainer(cls, arrayGenome, seed)
+    for _ in range(gens):
+        score(trainer)
+        trainer.select(['task'], 'min')
+        if generateFn is None:
+            trainer.generate()
+        else:
+            generateFn(trainer)
+        trainer.curGen += 1
+        trainer.registerBank.clear()
+    return population(trainer)
+
+@pytest.mark.parametrize('cls,arrayGenome', trainerCases)
+def testSameSeedSamePopulation(cls, arrayGenome):
+    expected = run(cls, arrayGenome, seed=1)
+    assert run(cls, arrayGenome, seed=1) == expected
+    assert run(cls, arrayGenome, seed=2) != expected
+
+@pytest.mark.parametrize('cls', [Trainer, TeamTrainer])
+def testListAndArrayGenomesSamePopulation(cls):
+    assert run(cls, False, seed=3) == run(cls, True, seed=3)
+
+@pytest.mark.parametrize('cls,arrayGenome', trainerCases)
+def testBulkMatchesSerial(cls, arrayGenome):
+    assert (run(cls, arrayGenome, generateFn=serialGenerate)
+            == run(cls, arrayGenome))
+
+@pytest.mark.parametrize('cls,arrayGenome', trainerCases)
+def testPoolsMatchNoPool(cls, arrayGenome):
+    expected = run(cls, arrayGenome)
+    for numWorkers in [1, 3]:
+        with ThreadPoolExecutor(numWorkers) as pool:
+            assert run(cls, arrayGenome, generateFn=lambda trainer:
+                    trainer.generate(pool=pool, chunkSize=7)) == expected
+    # not forked, earlier tests ran parallel kernels (see lgp.kernels)
+    with multiprocessing.get_context('forkserver').Pool(2) as pool:
+        assert run(cls, arrayGenome, generateFn=lambda trainer:
+                trainer.generate(pool=pool, chunkSize=7)) == expected
+
+@pytest.mark.parametrize('cls', [Trainer, TeamTrainer])
+def testBreedOrderIndependent(cls):
+    children = []
+    for reverse in [False, True]:
+        trainer = makeTrainer(cls, False, 4)
+        score(trainer)
+        trainer.select(['task'], 'min')
+        parents = list(trainer.getAgents())
+        allPrograms = list(trainer.programs)
+        numNew = trainer.popSize - len(parents)
+        parentIdxs = trainer.rng.integers(len(parents), size=numNew)
+        rngs = trainer.spawnRngs(numNew)
+        genomes = {}
+        for i in sorted(range(numNew), reverse=reverse):
+            if cls is TeamTrainer:
+                child = trainer.breed(parents[parentIdxs[i]], rngs[i],
+                        allPrograms)
+                genomes[i] = [list(prog.instructions)
+                              for prog in child.programs]
+            else:
+                child = trainer.breed(parents[parentIdxs[i]], rngs[i])
+                genomes[i] = list(child.instructions)
+        children.append([genomes[i] for i in range(numNew)])
+    assert children[0] == children[1]
+
+class CountingPool(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(2)
+        self.numMaps = 0
+
+    def map(self, *args, **kwargs):
+        self.numMaps += 1
+        return super().map(*args, **kwargs)
+
+@pytest.mark.parametrize('cls,arrayGenome', trainerCases)
+def testEvolvePassesPool(cls, arrayGenome):
+    results = []
+    with CountingPool() as pool:
+        for evolvePool in [None, pool]:
+            trainer = makeTrainer(cls, arrayGenome, 0)
+            for _ in range(3):
+                score(trainer)
+                trainer.evolve(['task'], pool=evolvePool, chunkSize=7)
+            results.append(population(trainer))
+    assert results[0] == results[1]
+    assert pool.numMaps > 0
@@ -0,0 +1,50 @@
+from lgp.steady_state import SteadyStateEvolver
+from lgp.trainer import Trainer
+
+"""
+Checks that SteadyStateEvolver.ask only hands out agents without scores, also
+when bred children get their scores from the result cache.
+"""
+
+def makeEvolver():
+    trainer = Trainer(numActions=3, popSize=10, maxProgSize=16, cacheSize=100,
+            seed=0)
+    evolver = SteadyStateEvolver(trainer, 'task')
+    for i in range(trainer.popSize):
+        agent = evolver.ask()
+        evolver.tell(agent.id, {'task': float(i)})
+    return trainer, evolver
+
+"""
+Makes the next numHits cache lookups of the trainer hit, and the ones after
+miss.
+"""
+def hitCache(trainer, numHits):
+    hits = [numHits]
+    def hitLookup(key):
+        if hits[0] > 0:
+            hits[0] -= 1
+            return {'task': 0.5}
+        return None
+    trainer.resultCache.lookup = hitLookup
+
+def testAskSkipsCachedChildren():
+    trainer, evolver = makeEvolver()
+    hitCache(trainer, 3)
+    agent = evolver.ask()
+    assert 'task' not in agent.outcomes
+    assert list(evolver.inFlight) == [agent.id]
+    assert evolver.numTold == trainer.popSize + 3
+
+def testAskNoneWhenAllChildrenCached():
+    trainer, evolver = makeEvolver()
+    hitCache(trainer, trainer.popSize)
+    assert evolver.ask() is None
+    assert evolver.inFlight == {}
+    assert evolver.numTold == 2*trainer.popSize
+    assert trainer.curGen == 2
+    assert all('task' in prog.outcomes for prog in trainer.programs)
+
+    agent = evolver.ask()
+    assert 'task' not in agent.outcomes
+    assert list(evolver.inFlight) == [agent.id]